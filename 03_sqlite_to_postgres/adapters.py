@@ -0,0 +1,47 @@
+from dataclasses import fields as dataclass_fields
+from functools import lru_cache
+from operator import itemgetter
+
+from utils import get_model_by_table
+
+# Экранирование текстового формата COPY; NULL передаётся как \N
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+COPY_NULL = '\\N'
+
+
+def _copy_text(value) -> str:
+    return value.translate(COPY_ESCAPES) if isinstance(value, str) else str(value)
+
+
+class RowAdapter:
+    """Разбор строк SQLite одной таблицы, подготовленный один раз для всех пачек.
+
+    SQLite возвращает обычные кортежи (rowid, поля модели в порядке dataclass), поэтому значения
+    для Postgres получаются срезом кортежа без промежуточных словарей. Способ записи в COPY выбирается
+    по типу поля: экранировать нужно только текст, uuid, даты и числа передаются как есть.
+    """
+
+    def __init__(self, table: str, model):
+        self.table = table
+        self.fields = tuple(f.name for f in dataclass_fields(model))
+        self.columns = ','.join(self.fields)
+        self.rowid = itemgetter(0)
+        self.values = itemgetter(slice(1, None))
+        self.id = itemgetter(self.fields.index('id') + 1)
+        self.formatters = tuple(_copy_text if f.type is str else str for f in dataclass_fields(model))
+
+    def get_select_query(self) -> str:
+        return 'SELECT rowid, {columns} FROM {table}'.format(columns=self.columns, table=self.table)
+
+    def prepare(self, data) -> list[tuple]:
+        return list(map(self.values, data))
+
+    def copy_line(self, row) -> str:
+        return '\t'.join(COPY_NULL if value is None else formatter(value)
+                         for formatter, value in zip(self.formatters, self.values(row))) + '\n'
+
+
+@lru_cache(maxsize=None)
+def get_row_adapter(table: str) -> RowAdapter | None:
+    model = get_model_by_table(table)
+    return RowAdapter(table, model) if model else None
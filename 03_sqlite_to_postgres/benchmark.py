@@ -0,0 +1,270 @@
+"""Замер скорости загрузки SQLite -> Postgres на синтетических данных.
+
+Нужна пустая одноразовая база Postgres с применёнными миграциями Django: перед каждым прогоном
+таблицы схемы content очищаются. Поэтому база задаётся только явно через --dsn, а не переменными
+DB_* загрузчика, и на таблицах с данными бенчмарк без --force не запускается. Результат печатается
+в JSON, чтобы сравнивать размеры пачек и режимы загрузки между коммитами.
+
+    python benchmark.py --dsn 'dbname=movies_benchmark user=app' --films 100000 --persons 50000 \\
+        --batch-sizes 1000,5000 --modes insert,copy --strategies sequential,pipeline,sharded
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import random
+import resource
+import sqlite3
+import subprocess
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from functools import wraps
+from itertools import product
+
+import loaders
+import psycopg2
+from checkpoints import PostgresCheckpoint
+from load_data import SAVERS, load_from_sqlite
+from pipeline import PipelinedExtractor
+from psycopg2.extras import DictCursor
+from settings import (CHECKPOINT_TABLE, PG_SCHEME, TABLE_FILMWORK, TABLE_GENRE, TABLE_GENRE_FILMWORK,
+                      TABLE_PERSON, TABLE_PERSON_FILMWORK, TABLES_MAPPING)
+from sharding import ShardedExtractor
+from utils import sqlite_conn_context
+
+ROLES = ('actor', 'director', 'writer')
+
+STRATEGY_SEQUENTIAL = 'sequential'
+STRATEGY_PIPELINE = 'pipeline'
+STRATEGY_SHARDED = 'sharded'
+STRATEGIES = (STRATEGY_SEQUENTIAL, STRATEGY_PIPELINE, STRATEGY_SHARDED)
+
+
+def generate_sqlite(path: str, films: int, persons: int, genres: int, genres_per_film: int,
+                    persons_per_film: int, seed: int = 0):
+    """Синтетическая база SQLite со структурой таблиц из models.py"""
+    rnd = random.Random(seed)
+    now = datetime.now(timezone.utc).isoformat()
+    connection = sqlite3.connect(path)
+    for table, model in TABLES_MAPPING.items():
+        columns = ', '.join('{0} {1}'.format(name, 'TEXT PRIMARY KEY' if name == 'id' else '')
+                            for name in model.__dataclass_fields__)
+        connection.execute('CREATE TABLE {table} ({columns})'.format(table=table, columns=columns))
+
+    def insert(table, rows):
+        fields = list(TABLES_MAPPING[table].__dataclass_fields__)
+        connection.executemany('INSERT INTO {table} ({fields}) VALUES ({params})'.format(
+            table=table, fields=','.join(fields), params=','.join('?' * len(fields))
+        ), (tuple({**row, 'id': str(uuid.UUID(int=rnd.getrandbits(128)))}[k] for k in fields) for row in rows))
+
+    genre_ids, person_ids, film_ids = [], [], []
+    insert(TABLE_GENRE, ({'name': 'genre {0}'.format(i), 'description': '', 'created_at': now, 'updated_at': now}
+                         for i in range(genres)))
+    insert(TABLE_PERSON, ({'full_name': 'person {0}'.format(i), 'created_at': now, 'updated_at': now}
+                          for i in range(persons)))
+    insert(TABLE_FILMWORK, ({'title': 'film {0}'.format(i), 'description': 'description ' * 20, 'creation_date': now,
+                             'file_path': '', 'rating': round(rnd.uniform(0, 10), 1), 'type': 'movie',
+                             'created_at': now, 'updated_at': now} for i in range(films)))
+    for table, ids in ((TABLE_GENRE, genre_ids), (TABLE_PERSON, person_ids), (TABLE_FILMWORK, film_ids)):
+        ids.extend(row[0] for row in connection.execute('SELECT id FROM {table}'.format(table=table)))
+
+    insert(TABLE_GENRE_FILMWORK, ({'film_work_id': film_id, 'genre_id': genre_id, 'created_at': now}
+                                  for film_id in film_ids
+                                  for genre_id in rnd.sample(genre_ids, min(genres_per_film, len(genre_ids)))))
+    insert(TABLE_PERSON_FILMWORK, ({'film_work_id': film_id, 'person_id': person_id, 'role': rnd.choice(ROLES),
+                                    'created_at': now}
+                                   for film_id in film_ids
+                                   for person_id in rnd.sample(person_ids, min(persons_per_film, len(person_ids)))))
+    connection.commit()
+    connection.close()
+
+
+class Timings:
+    """Суммарное время, проведённое в обёрнутых функциях и генераторах"""
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+
+    def wrap(self, label, func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.seconds[label] += time.perf_counter() - started
+        return wrapper
+
+    def wrap_generator(self, label, func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            iterator = func(*args, **kwargs)
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    self.seconds[label] += time.perf_counter() - started
+                yield item
+        return wrapper
+
+
+def instrument(timings: Timings):
+    loaders.SQLiteLoader.fetchmany = timings.wrap_generator('sqlite_fetchmany', loaders.SQLiteLoader.fetchmany)
+    # Пачки стратегий pipeline и sharded приходят подготовленными и пишутся сразу через save_prepared
+    for saver in (loaders.PostgresSaver, loaders.PostgresCopySaver):
+        saver.prepare = staticmethod(timings.wrap('prepare_data', saver.prepare))
+        saver.save_prepared = timings.wrap('write_data', saver.save_prepared)
+
+
+def truncate(pg_conn):
+    """Очистка таблиц вместе с контрольными точками, иначе прогон продолжит загрузку с позиции предыдущего"""
+    PostgresCheckpoint(pg_conn).prepare()
+    tables = (*TABLES_MAPPING, CHECKPOINT_TABLE)
+    with pg_conn.cursor() as cur:
+        cur.execute('TRUNCATE {0}'.format(', '.join('{0}.{1}'.format(PG_SCHEME, table) for table in tables)))
+    pg_conn.commit()
+
+
+def get_filled_tables(dsn: str) -> list[str]:
+    with psycopg2.connect(dsn) as pg_conn, pg_conn.cursor() as cur:
+        filled = []
+        for table in TABLES_MAPPING:
+            cur.execute('SELECT EXISTS (SELECT 1 FROM {0}.{1})'.format(PG_SCHEME, table))
+            if cur.fetchone()[0]:
+                filled.append(table)
+    pg_conn.close()
+    return filled
+
+
+def count_rows(sqlite_path: str) -> int:
+    with sqlite_conn_context(sqlite_path) as connection:
+        return sum(connection.execute('SELECT COUNT(*) FROM {0}'.format(table)).fetchone()[0]
+                   for table in TABLES_MAPPING)
+
+
+def run(sqlite_path: str, dsn: str, mode: str, strategy: str, batch_size: int, processes: int, queue_depth: int,
+        result_queue):
+    """Один прогон в отдельном процессе, чтобы пиковый RSS относился только к нему.
+
+    В стратегии sharded чтение и подготовка идут в дочерних процессах и в timings не попадают.
+    """
+    timings = Timings()
+    instrument(timings)
+    with ExitStack() as stack:
+        extractor = None
+        if strategy == STRATEGY_PIPELINE:
+            extractor = PipelinedExtractor(sqlite_path, batch_size, queue_depth, SAVERS[mode])
+        elif strategy == STRATEGY_SHARDED:
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers=processes))
+            extractor = ShardedExtractor(sqlite_path, executor, batch_size, queue_depth, SAVERS[mode])
+
+        with psycopg2.connect(dsn, cursor_factory=DictCursor) as pg_conn:
+            truncate(pg_conn)
+            with sqlite_conn_context(sqlite_path) as connection:
+                started = time.perf_counter()
+                load_from_sqlite(connection, pg_conn, SAVERS[mode], batch_size, extractor=extractor)
+                seconds = time.perf_counter() - started
+    result = {
+        'seconds': round(seconds, 3),
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'timings': {label: round(value, 3) for label, value in timings.seconds.items()},
+    }
+    if strategy == STRATEGY_PIPELINE:
+        result['pipeline'] = {table: {stage: c.as_dict() for stage, c in counters.items()}
+                              for table, counters in extractor.counters.items()}
+    result_queue.put(result)
+
+
+def wait_result(process: multiprocessing.Process, result_queue):
+    """Результат забирается до join: процесс не завершится, пока не передаст всё, что положил в очередь"""
+    while True:
+        try:
+            return result_queue.get(timeout=1)
+        except queue.Empty:
+            if not process.is_alive():
+                raise RuntimeError('Прогон завершился с кодом {0}, не вернув результат'.format(process.exitcode))
+
+
+def get_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Бенчмарк загрузки SQLite -> Postgres')
+    parser.add_argument('--dsn', required=True, help='строка подключения к одноразовой базе; её таблицы очищаются')
+    parser.add_argument('--force', action='store_true', help='запускать, даже если в таблицах уже есть данные')
+    parser.add_argument('--films', type=int, default=10000)
+    parser.add_argument('--persons', type=int, default=5000)
+    parser.add_argument('--genres', type=int, default=30)
+    parser.add_argument('--genres-per-film', type=int, default=3)
+    parser.add_argument('--persons-per-film', type=int, default=10)
+    parser.add_argument('--batch-sizes', default='1000', help='размеры пачек через запятую')
+    parser.add_argument('--modes', default=','.join(SAVERS), help='режимы загрузки через запятую')
+    parser.add_argument('--strategies', default=STRATEGY_SEQUENTIAL,
+                        help='способы чтения через запятую: {0}'.format(', '.join(STRATEGIES)))
+    parser.add_argument('--processes', type=int, default=os.cpu_count(), help='процессы для стратегии sharded')
+    parser.add_argument('--queue-depth', type=int, default=8)
+    parser.add_argument('--sqlite', help='готовая база SQLite вместо синтетической')
+    parser.add_argument('-o', '--output', help='файл для результата; по умолчанию stdout')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    filled = get_filled_tables(args.dsn)
+    if filled and not args.force:
+        raise SystemExit('В таблицах {0} уже есть данные, бенчмарк их очистит. Укажите одноразовую базу '
+                         'или добавьте --force'.format(', '.join(filled)))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sqlite_path = args.sqlite
+        if not sqlite_path:
+            sqlite_path = os.path.join(tmp_dir, 'benchmark.sqlite')
+            generate_sqlite(sqlite_path, args.films, args.persons, args.genres, args.genres_per_film,
+                            args.persons_per_film)
+        rows = count_rows(sqlite_path)
+
+        runs = []
+        for mode, strategy, batch_size in product(args.modes.split(','), args.strategies.split(','),
+                                                  map(int, args.batch_sizes.split(','))):
+            result_queue = multiprocessing.Queue()
+            process = multiprocessing.Process(target=run, args=(sqlite_path, args.dsn, mode, strategy, batch_size,
+                                                                args.processes, args.queue_depth, result_queue))
+            process.start()
+            result = wait_result(process, result_queue)
+            process.join()
+            if process.exitcode:
+                raise RuntimeError('Прогон {0}/{1}/{2} завершился с кодом {3}'.format(
+                    mode, strategy, batch_size, process.exitcode))
+            runs.append({'mode': mode, 'strategy': strategy, 'batch_size': batch_size, 'rows': rows,
+                         'rows_per_sec': round(rows / result['seconds'], 1) if result['seconds'] else None,
+                         **result})
+
+    report = json.dumps({
+        'revision': get_revision(),
+        'dataset': {'sqlite': args.sqlite, 'films': args.films, 'persons': args.persons, 'genres': args.genres,
+                    'genres_per_film': args.genres_per_film, 'persons_per_film': args.persons_per_film,
+                    'rows': rows},
+        'runs': runs,
+    }, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(report)
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
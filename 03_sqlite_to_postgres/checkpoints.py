@@ -0,0 +1,41 @@
+from dataclasses import dataclass, field
+
+from psycopg2.extensions import connection as _connection
+from settings import CHECKPOINT_TABLE, PG_SCHEME
+
+
+@dataclass
+class PostgresCheckpoint:
+    """Позиция загрузки каждой таблицы хранится в Postgres и фиксируется в одной транзакции с пачкой"""
+    connection: _connection
+    pg_scheme: str = field(default=PG_SCHEME)
+    table: str = field(default=CHECKPOINT_TABLE)
+
+    def prepare(self):
+        with self.connection.cursor() as cur:
+            cur.execute('CREATE TABLE IF NOT EXISTS {scheme}.{table} ('
+                        'table_name TEXT PRIMARY KEY, '
+                        'last_rowid BIGINT NOT NULL, '
+                        'rows_loaded BIGINT NOT NULL, '
+                        'updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW())'
+                        .format(scheme=self.pg_scheme, table=self.table))
+        self.connection.commit()
+
+    def get(self, table: str) -> tuple[int | None, int]:
+        with self.connection.cursor() as cur:
+            cur.execute('SELECT last_rowid, rows_loaded FROM {scheme}.{table} WHERE table_name = %s'
+                        .format(scheme=self.pg_scheme, table=self.table), (table,))
+            row = cur.fetchone()
+        return (row[0], row[1]) if row else (None, 0)
+
+    def save(self, table: str, last_rowid: int, rows_loaded: int):
+        with self.connection.cursor() as cur:
+            cur.execute('INSERT INTO {scheme}.{table} (table_name, last_rowid, rows_loaded) VALUES (%s, %s, %s) '
+                        'ON CONFLICT (table_name) DO UPDATE SET last_rowid=EXCLUDED.last_rowid, '
+                        'rows_loaded=EXCLUDED.rows_loaded, updated_at=NOW()'
+                        .format(scheme=self.pg_scheme, table=self.table), (table, last_rowid, rows_loaded))
+
+    def clear(self):
+        with self.connection.cursor() as cur:
+            cur.execute('DELETE FROM {scheme}.{table}'.format(scheme=self.pg_scheme, table=self.table))
+        self.connection.commit()
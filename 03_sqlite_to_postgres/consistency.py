@@ -0,0 +1,226 @@
+import hashlib
+import sqlite3
+from dataclasses import dataclass, field
+from dataclasses import fields as dataclass_fields
+from datetime import datetime, timezone
+from typing import Any, Callable
+
+from psycopg2.extensions import connection as _connection
+from settings import PG_SCHEME
+from utils import get_model_by_table
+
+# Служебные поля заполняются при загрузке и в источнике не совпадают
+IGNORED_FIELDS = ('created_at', 'updated_at')
+
+CHUNK_SIZE = 1000
+MAX_SAMPLES = 10
+
+
+def normalize(value) -> str:
+    """Значение в виде текста, одинакового для SQLite и Postgres; пустые значения равны между собой"""
+    return str(value) if value else ''
+
+
+def normalize_datetime(value) -> str:
+    """SQLite хранит время текстом, Postgres отдаёт datetime; сравнивается момент времени в UTC"""
+    if not value:
+        return ''
+    moment = value if isinstance(value, datetime) else datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).isoformat()
+
+
+def normalize_float(value) -> str:
+    return repr(float(value)) if value else ''
+
+
+NORMALIZERS = {datetime: normalize_datetime, float: normalize_float}
+
+
+def get_compared_fields(table: str) -> tuple[str, ...]:
+    model = get_model_by_table(table)
+    names = [f.name for f in dataclass_fields(model) if f.name not in IGNORED_FIELDS]
+    names.remove('id')
+    return ('id', *names)
+
+
+def get_normalizers(table: str, names: tuple[str, ...]) -> tuple[Callable[[Any], str], ...]:
+    """Приведение каждого столбца к тексту по типу поля модели"""
+    types = {f.name: f.type for f in dataclass_fields(get_model_by_table(table))}
+    return tuple(NORMALIZERS.get(types[name], normalize) for name in names)
+
+
+def normalize_row(normalizers: tuple[Callable[[Any], str], ...], row: tuple) -> tuple[str, ...]:
+    return tuple(normalizer(value) for normalizer, value in zip(normalizers, row))
+
+
+def get_id_condition(after_id: str | None, until_id: str | None, placeholder: str = '?') -> tuple[str, tuple]:
+    conditions, params = [], []
+    if after_id is not None:
+        conditions.append('id > ' + placeholder)
+        params.append(after_id)
+    if until_id is not None:
+        conditions.append('id <= ' + placeholder)
+        params.append(until_id)
+    return (' WHERE ' + ' AND '.join(conditions) if conditions else ''), tuple(params)
+
+
+def get_chunk_hash(rows: list[tuple]) -> str:
+    digest = hashlib.md5(usedforsecurity=False)
+    for row in rows:
+        digest.update('\t'.join(row).encode())
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+@dataclass
+class TableDiff:
+    """Итог сравнения таблицы; идентификаторы расхождений хранятся только примерами, чтобы не расти с таблицей"""
+    table: str
+    fields: tuple[str, ...]
+    sqlite_rows: int = 0
+    pg_rows: int = 0
+    chunks: int = 0
+    mismatched_chunks: int = 0
+    missing: int = 0
+    extra: int = 0
+    different: int = 0
+    missing_ids: list = field(default_factory=list)
+    extra_ids: list = field(default_factory=list)
+    differences: list = field(default_factory=list)
+    max_samples: int = MAX_SAMPLES
+
+    @property
+    def is_consistent(self) -> bool:
+        return not (self.missing or self.extra or self.different)
+
+    def add_missing(self, row_id: str):
+        self.missing += 1
+        if len(self.missing_ids) < self.max_samples:
+            self.missing_ids.append(row_id)
+
+    def add_extra(self, row_id: str):
+        self.extra += 1
+        if len(self.extra_ids) < self.max_samples:
+            self.extra_ids.append(row_id)
+
+    def add_different(self, sqlite_row: tuple, pg_row: tuple):
+        self.different += 1
+        if len(self.differences) < self.max_samples:
+            self.differences.append({
+                'id': sqlite_row[0],
+                'fields': {name: {'sqlite': sqlite_value, 'pg': pg_value}
+                           for name, sqlite_value, pg_value in zip(self.fields, sqlite_row, pg_row)
+                           if sqlite_value != pg_value},
+            })
+
+    def merge(self, other: 'TableDiff'):
+        """Добавление итога соседнего диапазона id той же таблицы"""
+        for name in ('sqlite_rows', 'pg_rows', 'chunks', 'mismatched_chunks', 'missing', 'extra', 'different'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for name in ('missing_ids', 'extra_ids', 'differences'):
+            samples = getattr(self, name)
+            samples.extend(getattr(other, name)[:self.max_samples - len(samples)])
+
+    def as_dict(self) -> dict:
+        return {
+            'table': self.table,
+            'consistent': self.is_consistent,
+            'sqlite_rows': self.sqlite_rows,
+            'pg_rows': self.pg_rows,
+            'chunks': self.chunks,
+            'mismatched_chunks': self.mismatched_chunks,
+            'missing': self.missing,
+            'extra': self.extra,
+            'different': self.different,
+            'missing_ids': self.missing_ids,
+            'extra_ids': self.extra_ids,
+            'differences': self.differences,
+        }
+
+
+@dataclass
+class ConsistencyChecker:
+    """Потоковое сравнение таблиц SQLite и Postgres.
+
+    Обе стороны читаются по возрастанию id: SQLite обычным курсором, Postgres именованным
+    (серверным) курсором, так что в памяти держится не больше пачки строк с каждой стороны.
+    Пачка SQLite задаёт границу id, строки Postgres до этой границы образуют парную пачку.
+    Сначала сравниваются хэши пачек, построчно разбираются только несовпавшие.
+    """
+    sqlite_connection: sqlite3.Connection
+    pg_connection: _connection
+    chunk_size: int = field(default=CHUNK_SIZE)
+    pg_scheme: str = field(default=PG_SCHEME)
+
+    def compare_table(self, table: str, after_id: str | None = None, until_id: str | None = None) -> TableDiff:
+        """Сравнение всей таблицы или диапазона id (after_id, until_id]"""
+        diff = TableDiff(table, get_compared_fields(table))
+        columns = ','.join(diff.fields)
+        normalizers = get_normalizers(table, diff.fields)
+        pg_rows = self.__iter_pg(table, columns, *get_id_condition(after_id, until_id, '%s'), diff, normalizers)
+
+        pending = None
+        sqlite_chunks = self.__iter_sqlite_chunks(table, columns, *get_id_condition(after_id, until_id), diff,
+                                                  normalizers)
+        for sqlite_chunk in sqlite_chunks:
+            upper = sqlite_chunk[-1][0]
+            pg_chunk = []
+            # Отложенная строка может лежать и за границей этой пачки, тогда она ждёт следующей
+            if pending is not None and pending[0] <= upper:
+                pg_chunk.append(pending)
+                pending = None
+            if pending is None:
+                for row in pg_rows:
+                    if row[0] > upper:
+                        pending = row
+                        break
+                    pg_chunk.append(row)
+            self.__compare_chunk(diff, sqlite_chunk, pg_chunk)
+
+        # Всё, что в Postgres идёт после последней строки SQLite, лишнее
+        if pending is not None:
+            diff.add_extra(pending[0])
+        for row in pg_rows:
+            diff.add_extra(row[0])
+        return diff
+
+    def __iter_sqlite_chunks(self, table: str, columns: str, where: str, params: tuple, diff: TableDiff,
+                             normalizers: tuple):
+        cursor = self.sqlite_connection.cursor()
+        cursor.row_factory = None
+        try:
+            cursor.execute('SELECT {columns} FROM {table}{where} ORDER BY id'
+                           .format(columns=columns, table=table, where=where), params)
+            while chunk := cursor.fetchmany(self.chunk_size):
+                diff.sqlite_rows += len(chunk)
+                yield [normalize_row(normalizers, row) for row in chunk]
+        finally:
+            cursor.close()
+
+    def __iter_pg(self, table: str, columns: str, where: str, params: tuple, diff: TableDiff, normalizers: tuple):
+        with self.pg_connection.cursor(name='consistency_{0}'.format(table)) as cursor:
+            cursor.itersize = self.chunk_size
+            cursor.execute('SELECT {columns} FROM {scheme}.{table}{where} ORDER BY id'
+                           .format(columns=columns, scheme=self.pg_scheme, table=table, where=where), params)
+            for row in cursor:
+                diff.pg_rows += 1
+                yield normalize_row(normalizers, row)
+
+    @staticmethod
+    def __compare_chunk(diff: TableDiff, sqlite_chunk: list[tuple], pg_chunk: list[tuple]):
+        diff.chunks += 1
+        if get_chunk_hash(sqlite_chunk) == get_chunk_hash(pg_chunk):
+            return
+        diff.mismatched_chunks += 1
+
+        pg_by_id = {row[0]: row for row in pg_chunk}
+        for sqlite_row in sqlite_chunk:
+            pg_row = pg_by_id.pop(sqlite_row[0], None)
+            if pg_row is None:
+                diff.add_missing(sqlite_row[0])
+            elif pg_row != sqlite_row:
+                diff.add_different(sqlite_row, pg_row)
+        for row_id in pg_by_id:
+            diff.add_extra(row_id)
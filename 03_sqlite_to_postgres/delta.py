@@ -0,0 +1,79 @@
+import hashlib
+import sqlite3
+from dataclasses import dataclass, field
+
+from adapters import get_row_adapter
+from psycopg2.extensions import connection as _connection
+from psycopg2.extras import execute_values
+from settings import DEPENDENT_TABLES, PG_SCHEME, ROW_HASH_TABLE
+
+
+@dataclass
+class PostgresRowHashes:
+    """Хэши загруженных строк: в Postgres отправляются только новые, изменённые и удалённые в SQLite строки"""
+    connection: _connection
+    pg_scheme: str = field(default=PG_SCHEME)
+    table: str = field(default=ROW_HASH_TABLE)
+    page_size: int = field(default=500)
+
+    def prepare(self):
+        with self.connection.cursor() as cur:
+            cur.execute('CREATE TABLE IF NOT EXISTS {scheme}.{table} ('
+                        'table_name TEXT NOT NULL, '
+                        'id UUID NOT NULL, '
+                        'row_hash TEXT NOT NULL, '
+                        'PRIMARY KEY (table_name, id))'.format(scheme=self.pg_scheme, table=self.table))
+        self.connection.commit()
+
+    @staticmethod
+    def get_row_hash(row, adapter) -> str:
+        return hashlib.md5(adapter.copy_line(row).encode()).hexdigest()
+
+    def get_changed(self, table: str, data) -> tuple[list, list[tuple[str, str]]]:
+        """Строки пачки, которых нет среди сохранённых хэшей или хэш которых изменился, и их новые хэши"""
+        adapter = get_row_adapter(table)
+        hashes = {adapter.id(row): (row, self.get_row_hash(row, adapter)) for row in data}
+        with self.connection.cursor() as cur:
+            cur.execute('SELECT id::text, row_hash FROM {scheme}.{table} WHERE table_name = %s AND id = ANY(%s::uuid[])'
+                        .format(scheme=self.pg_scheme, table=self.table), (table, list(hashes)))
+            stored = dict(cur.fetchall())
+        changed = [(row, row_hash) for row_id, (row, row_hash) in hashes.items() if stored.get(row_id) != row_hash]
+        return [row for row, _ in changed], [(adapter.id(row), row_hash) for row, row_hash in changed]
+
+    def save(self, table: str, hashes: list[tuple[str, str]]):
+        with self.connection.cursor() as cur:
+            execute_values(cur, 'INSERT INTO {scheme}.{table} (table_name, id, row_hash) VALUES %s '
+                                'ON CONFLICT (table_name, id) DO UPDATE SET row_hash=EXCLUDED.row_hash'
+                                .format(scheme=self.pg_scheme, table=self.table),
+                           [(table, row_id, row_hash) for row_id, row_hash in hashes], page_size=self.page_size)
+
+    def iter_deleted(self, table: str, connection: sqlite3.Connection):
+        """Пачки id, для которых есть хэш, но строки в SQLite уже нет"""
+        last_id = '00000000-0000-0000-0000-000000000000'
+        while True:
+            with self.connection.cursor() as cur:
+                cur.execute('SELECT id::text FROM {scheme}.{table} WHERE table_name = %s AND id > %s::uuid '
+                            'ORDER BY id LIMIT %s'.format(scheme=self.pg_scheme, table=self.table),
+                            (table, last_id, self.page_size))
+                ids = [row[0] for row in cur.fetchall()]
+            if not ids:
+                break
+            last_id = ids[-1]
+            existing = {row[0] for row in connection.execute(
+                'SELECT id FROM {table} WHERE id IN ({params})'.format(table=table, params=','.join('?' * len(ids))),
+                ids,
+            )}
+            deleted = [row_id for row_id in ids if row_id not in existing]
+            if deleted:
+                yield deleted
+
+    def delete(self, table: str, ids: list[str]):
+        """Удаление строк вместе со ссылающимися на них строками связей и их хэшами"""
+        with self.connection.cursor() as cur:
+            for dependent, column in DEPENDENT_TABLES.get(table, ()):
+                cur.execute('DELETE FROM {scheme}.{dependent} WHERE {column} = ANY(%s::uuid[])'
+                            .format(scheme=self.pg_scheme, dependent=dependent, column=column), (ids,))
+            cur.execute('DELETE FROM {scheme}.{table} WHERE id = ANY(%s::uuid[])'
+                        .format(scheme=self.pg_scheme, table=table), (ids,))
+            cur.execute('DELETE FROM {scheme}.{hashes} WHERE table_name = %s AND id = ANY(%s::uuid[])'
+                        .format(scheme=self.pg_scheme, hashes=self.table), (table, ids))
@@ -0,0 +1,119 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import psycopg2
+from psycopg2.extensions import connection as _connection
+from settings import DEFERRED_DDL_TABLE, PG_SCHEME, TABLES_MAPPING
+
+logger = logging.getLogger(__name__)
+
+KIND_INDEX = 'index'
+KIND_UNIQUE = 'unique'
+KIND_FOREIGN_KEY = 'foreign_key'
+
+# Порядок восстановления: внешним ключам нужны уже построенные индексы таблиц
+RESTORE_ORDER = ((KIND_INDEX, KIND_UNIQUE), (KIND_FOREIGN_KEY,))
+
+SECONDARY_INDEXES_QUERY = """
+SELECT t.relname, i.relname, pg_get_indexdef(i.oid)
+FROM pg_index x
+JOIN pg_class i ON i.oid = x.indexrelid
+JOIN pg_class t ON t.oid = x.indrelid
+JOIN pg_namespace n ON n.oid = t.relnamespace
+WHERE n.nspname = %s AND t.relname = ANY(%s)
+  AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)
+"""
+
+CONSTRAINTS_QUERY = """
+SELECT t.relname, c.conname, pg_get_constraintdef(c.oid), c.contype
+FROM pg_constraint c
+JOIN pg_class t ON t.oid = c.conrelid
+JOIN pg_namespace n ON n.oid = t.relnamespace
+WHERE n.nspname = %s AND t.relname = ANY(%s) AND c.contype IN ('f', 'u')
+"""
+
+
+@dataclass
+class DeferredSchema:
+    """Вторичные индексы, уникальные и внешние ключи, снятые на время первичной загрузки в пустые таблицы.
+
+    Определения сохраняются в Postgres до удаления, поэтому прерванную загрузку можно продолжить,
+    а индексы и ключи восстановить после неё. Построить индекс один раз по загруженным данным
+    намного быстрее, чем обновлять его на каждой вставке.
+    """
+    connection: _connection
+    pg_scheme: str = field(default=PG_SCHEME)
+    table: str = field(default=DEFERRED_DDL_TABLE)
+    tables: tuple = field(default=tuple(TABLES_MAPPING))
+
+    def prepare(self):
+        with self.connection.cursor() as cur:
+            cur.execute('CREATE TABLE IF NOT EXISTS {scheme}.{table} ('
+                        'name TEXT PRIMARY KEY, '
+                        'table_name TEXT NOT NULL, '
+                        'kind TEXT NOT NULL, '
+                        'definition TEXT NOT NULL)'.format(scheme=self.pg_scheme, table=self.table))
+        self.connection.commit()
+
+    def get_saved(self) -> list[tuple[str, str, str, str]]:
+        with self.connection.cursor() as cur:
+            cur.execute('SELECT name, table_name, kind, definition FROM {scheme}.{table}'
+                        .format(scheme=self.pg_scheme, table=self.table))
+            return [tuple(row) for row in cur.fetchall()]
+
+    def drop(self):
+        """Снятие индексов и ключей; если они уже сняты прерванной загрузкой, ничего не делает"""
+        self.prepare()
+        if self.get_saved():
+            logger.info('Indexes and constraints are already dropped by a previous fresh load')
+            return
+        self.__check_empty()
+
+        with self.connection.cursor() as cur:
+            cur.execute(CONSTRAINTS_QUERY, (self.pg_scheme, list(self.tables)))
+            items = [(name, table, KIND_FOREIGN_KEY if contype == 'f' else KIND_UNIQUE, definition)
+                     for table, name, definition, contype in cur.fetchall()]
+            cur.execute(SECONDARY_INDEXES_QUERY, (self.pg_scheme, list(self.tables)))
+            items += [(name, table, KIND_INDEX, definition) for table, name, definition in cur.fetchall()]
+
+            cur.executemany('INSERT INTO {scheme}.{table} (name, table_name, kind, definition) VALUES (%s, %s, %s, %s)'
+                            .format(scheme=self.pg_scheme, table=self.table), items)
+            # Сначала внешние ключи: уникальные ключи связей могут быть нужны им
+            for name, table, kind, _ in sorted(items, key=lambda item: item[2] != KIND_FOREIGN_KEY):
+                if kind == KIND_INDEX:
+                    cur.execute('DROP INDEX {scheme}."{name}"'.format(scheme=self.pg_scheme, name=name))
+                else:
+                    cur.execute('ALTER TABLE {scheme}.{table} DROP CONSTRAINT "{name}"'
+                                .format(scheme=self.pg_scheme, table=table, name=name))
+        self.connection.commit()
+        logger.info('Dropped %s indexes and constraints for the fresh load', len(items))
+
+    def restore(self, dsl: dict, workers: int = 4):
+        """Построение индексов параллельно, по соединению на индекс, затем проверка внешних ключей"""
+        saved = self.get_saved()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for kinds in RESTORE_ORDER:
+                list(executor.map(lambda item: self.__restore_item(dsl, *item),
+                                  [item for item in saved if item[2] in kinds]))
+        logger.info('Restored %s indexes and constraints', len(saved))
+
+    def __restore_item(self, dsl: dict, name: str, table: str, kind: str, definition: str):
+        with psycopg2.connect(**dsl) as connection:
+            with connection.cursor() as cur:
+                if kind == KIND_INDEX:
+                    cur.execute(definition)
+                else:
+                    cur.execute('ALTER TABLE {scheme}.{table} ADD CONSTRAINT "{name}" {definition}'
+                                .format(scheme=self.pg_scheme, table=table, name=name, definition=definition))
+                cur.execute('DELETE FROM {scheme}.{control} WHERE name = %s'
+                            .format(scheme=self.pg_scheme, control=self.table), (name,))
+        connection.close()
+
+    def __check_empty(self):
+        with self.connection.cursor() as cur:
+            for table in self.tables:
+                cur.execute('SELECT EXISTS (SELECT 1 FROM {scheme}.{table})'.format(scheme=self.pg_scheme, table=table))
+                if cur.fetchone()[0]:
+                    raise RuntimeError('Таблица {0}.{1} не пуста, первичная загрузка невозможна'
+                                       .format(self.pg_scheme, table))
@@ -1,32 +1,179 @@
+import argparse
+import logging
 import os
 import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack, closing
 
 import psycopg2
+from adapters import get_row_adapter
+from checkpoints import PostgresCheckpoint
+from delta import PostgresRowHashes
 from dotenv import load_dotenv
-from loaders import PostgresSaver, SQLiteLoader
+from fresh import DeferredSchema
+from loaders import PostgresCopySaver, PostgresSaver, SQLiteLoader
+from pipeline import PipelinedExtractor
 from psycopg2.extensions import connection as _connection
 from psycopg2.extras import DictCursor
+from psycopg2.pool import ThreadedConnectionPool
 from settings import TABLE_FILMWORK, TABLE_GENRE, TABLE_GENRE_FILMWORK, TABLE_PERSON, TABLE_PERSON_FILMWORK
-from utils import get_model_by_table, sqlite_conn_context
+from sharding import ShardedExtractor
+from utils import sqlite_conn_context
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
 
-def load_from_sqlite(connection: sqlite3.Connection, pg_conn: _connection):
+# Таблицы одного этапа не зависят друг от друга; связи загружаются после основных сущностей
+LOAD_STAGES = ((TABLE_GENRE, TABLE_PERSON, TABLE_FILMWORK), (TABLE_GENRE_FILMWORK, TABLE_PERSON_FILMWORK))
+
+SAVERS = {
+    'insert': PostgresSaver,
+    'copy': PostgresCopySaver,
+}
+
+
+def load_table(connection: sqlite3.Connection, pg_conn: _connection, table: str, saver_class=PostgresSaver,
+               batch_size: int = 1000, delta: bool = False, extractor=None):
+    """Загрузка таблицы с продолжения: каждая пачка фиксируется в Postgres вместе с контрольной точкой.
+
+    В режиме delta записываются только строки, хэш которых изменился с прошлой загрузки,
+    а строки, исчезнувшие из SQLite, удаляются. extractor (по умолчанию SQLiteLoader) поставляет
+    пачки ExtractedBatch.
+    """
+    if not get_row_adapter(table):
+        return
+    extractor = extractor or SQLiteLoader(connection, batch_size=batch_size)
+    postgres_saver = saver_class(pg_conn)
+    checkpoint = PostgresCheckpoint(pg_conn)
+    row_hashes = PostgresRowHashes(pg_conn) if delta else None
+    last_rowid, rows_loaded = checkpoint.get(table)
+    if last_rowid is not None:
+        logger.info('%s: resuming after rowid %s (%s rows already loaded)', table, last_rowid, rows_loaded)
+
+    rows_changed = rows_deleted = 0
+    for batch in extractor.extract(table, after_rowid=last_rowid):
+        if batch.prepared:
+            postgres_saver.save_prepared(table, batch.data)
+            rows_changed += batch.rows
+        elif batch.rows:
+            rows = batch.data
+            if row_hashes:
+                rows, hashes = row_hashes.get_changed(table, rows)
+                row_hashes.save(table, hashes)
+            if rows:
+                postgres_saver.save_data(table, rows)
+            rows_changed += len(rows)
+        last_rowid, rows_loaded = batch.last_rowid, rows_loaded + batch.rows
+        checkpoint.save(table, last_rowid, rows_loaded)
+        pg_conn.commit()
+
+    if row_hashes:
+        for ids in row_hashes.iter_deleted(table, connection):
+            row_hashes.delete(table, ids)
+            pg_conn.commit()
+            rows_deleted += len(ids)
+    logger.info('%s: %s rows read, %s written, %s deleted', table, rows_loaded, rows_changed, rows_deleted)
+
+
+def load_from_sqlite(connection: sqlite3.Connection, pg_conn: _connection, saver_class=PostgresSaver,
+                     batch_size: int = 1000, delta: bool = False, extractor=None):
     """Основной метод загрузки данных из SQLite в Postgres"""
-    sqlite_loader = SQLiteLoader(connection)
-    postgres_saver = PostgresSaver(pg_conn)
-    tables_to_upload = [TABLE_GENRE, TABLE_PERSON, TABLE_FILMWORK, TABLE_GENRE_FILMWORK,
-                        TABLE_PERSON_FILMWORK]
+    checkpoint = PostgresCheckpoint(pg_conn)
+    checkpoint.prepare()
+    if delta:
+        PostgresRowHashes(pg_conn).prepare()
+    for stage in LOAD_STAGES:
+        for table in stage:
+            load_table(connection, pg_conn, table, saver_class, batch_size, delta, extractor)
+    checkpoint.clear()
+
+
+def load_from_sqlite_concurrently(sqlite_path: str, dsl: dict, saver_class=PostgresCopySaver,
+                                  batch_size: int = 1000, workers: int = 3, delta: bool = False, extractor=None):
+    """Загрузка с параллельной обработкой независимых таблиц, у каждого потока своё соединение из пула"""
+    # Одно соединение сверх числа потоков занято контрольными точками
+    pool = ThreadedConnectionPool(1, workers + 1, **dsl, cursor_factory=DictCursor)
+
+    def worker(table):
+        pg_conn = pool.getconn()
+        try:
+            with sqlite_conn_context(sqlite_path) as connection:
+                load_table(connection, pg_conn, table, saver_class, batch_size, delta, extractor)
+        except Exception:
+            pg_conn.rollback()
+            raise
+        finally:
+            pool.putconn(pg_conn)
+
+    try:
+        checkpoint = PostgresCheckpoint(pool.getconn())
+        checkpoint.prepare()
+        if delta:
+            PostgresRowHashes(checkpoint.connection).prepare()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for stage in LOAD_STAGES:
+                list(executor.map(worker, stage))
+        checkpoint.clear()
+        pool.putconn(checkpoint.connection)
+    finally:
+        pool.closeall()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Перенос данных из SQLite в Postgres')
+    parser.add_argument('--sqlite', default='db.sqlite', help='путь к базе SQLite')
+    parser.add_argument('--mode', choices=SAVERS.keys(), default='insert',
+                        help='insert: INSERT ... ON CONFLICT пачками; copy: COPY во временные таблицы и слияние')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='число параллельно загружаемых таблиц (соединений с Postgres)')
+    parser.add_argument('--delta', action='store_true',
+                        help='записывать только строки, изменившиеся с прошлой загрузки, и удалять исчезнувшие')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='число процессов, читающих и готовящих диапазоны rowid каждой таблицы')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='читать, готовить и записывать пачки одновременно в отдельных потоках')
+    parser.add_argument('--queue-depth', type=int, default=8,
+                        help='сколько пачек может читаться или ждать записи в Postgres одновременно')
+    parser.add_argument('--fresh', action='store_true',
+                        help='первичная загрузка в пустые таблицы: индексы и ключи снимаются и строятся после загрузки')
+    parser.add_argument('--index-workers', type=int, default=4,
+                        help='число индексов, которые строятся параллельно после первичной загрузки')
+    return parser.parse_args()
+
 
-    for table in tables_to_upload:
-        model = get_model_by_table(table)
-        if model:
-            for batch in sqlite_loader.fetchmany(table):
-                postgres_saver.save_data(table, batch)
+def run(args, dsl: dict):
+    saver_class = SAVERS[args.mode]
+    with ExitStack() as stack:
+        deferred_schema = None
+        if args.fresh:
+            deferred_schema = DeferredSchema(stack.enter_context(closing(psycopg2.connect(**dsl))))
+            deferred_schema.drop()
+        extractor = None
+        if args.processes > 1:
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers=args.processes))
+            # В режиме delta строки сравниваются с хэшами при записи, поэтому заранее они не готовятся
+            extractor = ShardedExtractor(args.sqlite, executor, args.batch_size, args.queue_depth,
+                                         None if args.delta else saver_class)
+        elif args.pipeline:
+            extractor = PipelinedExtractor(args.sqlite, args.batch_size, args.queue_depth,
+                                           None if args.delta else saver_class)
+        if args.workers > 1:
+            load_from_sqlite_concurrently(args.sqlite, dsl, saver_class, args.batch_size, args.workers, args.delta,
+                                          extractor)
+        else:
+            with sqlite_conn_context(args.sqlite) as sqlite_conn:
+                with psycopg2.connect(**dsl, cursor_factory=DictCursor) as pg_conn:
+                    load_from_sqlite(sqlite_conn, pg_conn, saver_class, args.batch_size, args.delta, extractor)
+        if deferred_schema:
+            deferred_schema.restore(dsl, args.index_workers)
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    args = parse_args()
     dsl = {'dbname': os.getenv('DB_NAME'),
            'user': os.getenv('DB_USER'),
            'password': os.getenv('DB_PASSWORD'),
@@ -34,8 +181,7 @@ if __name__ == '__main__':
            'port': os.getenv('DB_PORT', 5432)}
 
     try:
-        with sqlite_conn_context('db.sqlite') as sqlite_conn:
-            with psycopg2.connect(**dsl, cursor_factory=DictCursor) as pg_conn:
-                load_from_sqlite(sqlite_conn, pg_conn)
-    except Exception as e:
-        print(e)
+        run(args, dsl)
+    except Exception:
+        logger.exception('Загрузка прервана; при повторном запуске она продолжится с последней пачки')
+        sys.exit(1)
@@ -1,11 +1,24 @@
+import io
 import sqlite3
 from dataclasses import dataclass, field
+from typing import Any, NamedTuple
 
-from models import Filmwork, Genre, GenreFilmwork, Person, PersonFilmwork
+from adapters import get_row_adapter
 from psycopg2.extensions import connection as _connection
 from psycopg2.extras import execute_values
-from settings import (PG_SCHEME, TABLE_FILMWORK, TABLE_GENRE, TABLE_GENRE_FILMWORK, TABLE_PERSON,
-                      TABLE_PERSON_FILMWORK)
+from settings import CONFLICT_OPTIONS, PG_SCHEME
+
+
+class ExtractedBatch(NamedTuple):
+    """Пачка, прочитанная из SQLite.
+
+    last_rowid -- rowid, до которого таблица прочитана без пропусков вместе с этой пачкой;
+    data -- строки SQLite либо, если prepared, данные, уже подготовленные методом prepare сохранителя.
+    """
+    last_rowid: int
+    rows: int
+    data: Any
+    prepared: bool = False
 
 
 @dataclass
@@ -13,20 +26,35 @@ class SQLiteLoader:
     connection: sqlite3.Connection
     batch_size: int = field(default=1000)
 
-    def __post_init__(self):
-        self.connection.row_factory = sqlite3.Row
-
-    def fetchmany(self, table: str):
+    def fetchmany(self, table: str, after_rowid: int | None = None, until_rowid: int | None = None):
+        """Пачки кортежей (rowid, поля модели в порядке dataclass), см. adapters.RowAdapter"""
         cur = self.__get_cursor()
-        cur.execute('SELECT * FROM {table}'.format(table=table))
+        conditions, params = [], []
+        if after_rowid is not None:
+            conditions.append('rowid > ?')
+            params.append(after_rowid)
+        if until_rowid is not None:
+            conditions.append('rowid <= ?')
+            params.append(until_rowid)
+        query = get_row_adapter(table).get_select_query()
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        cur.execute(query + ' ORDER BY rowid', params)
         while True:
             batch = cur.fetchmany(self.batch_size)
             if not batch:
                 break
             yield batch
 
+    def extract(self, table: str, after_rowid: int | None = None):
+        adapter = get_row_adapter(table)
+        for batch in self.fetchmany(table, after_rowid):
+            yield ExtractedBatch(adapter.rowid(batch[-1]), len(batch), batch)
+
     def __get_cursor(self):
-        return self.connection.cursor()
+        cur = self.connection.cursor()
+        cur.row_factory = None
+        return cur
 
 
 @dataclass
@@ -36,80 +64,61 @@ class PostgresSaver:
     pg_scheme: str = field(default=PG_SCHEME)
 
     def save_data(self, table, data):
-        worker = self.__get_worker(table)
-        if worker:
-            worker(data)
+        if get_row_adapter(table) and data:
+            self.save_prepared(table, self.prepare(table, data))
 
     @staticmethod
-    def __get_fields(model):
-        return ','.join(model.__dataclass_fields__.keys())
+    def prepare(table, data):
+        return get_row_adapter(table).prepare(data)
 
-    @staticmethod
-    def __get_values_in_key_order(data_row, keys):
-        _data = {}
-        for k in keys:
-            _data[k] = data_row[k]
-        return tuple(_data.values())
-
-    @staticmethod
-    def __prepare_data(data, model):
-        prepare_data = []
-        model_fields = model.__dataclass_fields__.keys()
-        for row in data:
-            prepare_data.append(PostgresSaver.__get_values_in_key_order(row, model_fields))
-        return prepare_data
-
-    def __save_genres(self, data: list[Genre]):
-        prepare_data = PostgresSaver.__prepare_data(data, Genre)
-        query = self.__get_query(TABLE_GENRE, Genre, 'ON CONFLICT (id) DO UPDATE SET name=EXCLUDED.name')
-        self.__execute_query(query, prepare_data)
-
-    def __save_persons(self, data: list[Person]):
-        prepare_data = PostgresSaver.__prepare_data(data, Person)
-        query = self.__get_query(TABLE_PERSON, Person,
-                                 'ON CONFLICT (id) DO UPDATE SET full_name=EXCLUDED.full_name')
-        self.__execute_query(query, prepare_data)
-
-    def __save_film_work(self, data: list[Filmwork]):
-        prepare_data = PostgresSaver.__prepare_data(data, Filmwork)
-        query = self.__get_query(TABLE_FILMWORK, Filmwork,
-                                 'ON CONFLICT (id) DO UPDATE SET title=EXCLUDED.title')
-        self.__execute_query(query, prepare_data)
-
-    def __save_genre_film_work(self, data: list[GenreFilmwork]):
-        prepare_data = PostgresSaver.__prepare_data(data, GenreFilmwork)
-        query = self.__get_query(TABLE_GENRE_FILMWORK, GenreFilmwork)
-        self.__execute_query(query, prepare_data)
-
-    def __save_person_film_work(self, data: list[PersonFilmwork]):
-        prepare_data = PostgresSaver.__prepare_data(data, PersonFilmwork)
-        query = self.__get_query(TABLE_PERSON_FILMWORK, PersonFilmwork)
-        self.__execute_query(query, prepare_data)
+    def save_prepared(self, table, prepared):
+        self.__execute_query(self.__get_query(table), prepared)
 
     def __get_cursor(self):
         return self.connection.cursor()
 
-    def __get_worker(self, table: str):
-        if table == TABLE_GENRE:
-            return self.__save_genres
-        elif table == TABLE_PERSON:
-            return self.__save_persons
-        elif table == TABLE_FILMWORK:
-            return self.__save_film_work
-        elif table == TABLE_PERSON_FILMWORK:
-            return self.__save_person_film_work
-        elif table == TABLE_GENRE_FILMWORK:
-            return self.__save_genre_film_work
-        return None
-
     def __execute_query(self, query, data):
         cur = self.__get_cursor()
         execute_values(cur, query, data, page_size=self.page_size)
 
-    def __get_query(self, table, model, options='ON CONFLICT (id) DO NOTHING'):
-        fields = PostgresSaver.__get_fields(model)
+    def __get_query(self, table):
+        fields = get_row_adapter(table).columns
         query = 'INSERT INTO {scheme}.{table} ({fields}) values %s {options}'.format(scheme=self.pg_scheme,
                                                                                      table=table,
                                                                                      fields=fields,
-                                                                                     options=options)
+                                                                                     options=CONFLICT_OPTIONS[table])
         return query
+
+
+@dataclass
+class PostgresCopySaver:
+    """Пачка передаётся через COPY во временную таблицу и сливается в целевую одним INSERT ... SELECT"""
+    connection: _connection
+    pg_scheme: str = field(default=PG_SCHEME)
+
+    def save_data(self, table, data):
+        if get_row_adapter(table) and data:
+            self.save_prepared(table, self.prepare(table, data))
+
+    @staticmethod
+    def prepare(table, data) -> str:
+        return ''.join(map(get_row_adapter(table).copy_line, data))
+
+    def save_prepared(self, table, prepared):
+        staging = self.__get_staging_table(table)
+        buffer = io.StringIO(prepared)
+        columns = get_row_adapter(table).columns
+        with self.connection.cursor() as cur:
+            cur.copy_expert('COPY {staging} ({columns}) FROM STDIN'.format(staging=staging, columns=columns), buffer)
+            cur.execute('INSERT INTO {scheme}.{table} ({columns}) SELECT {columns} FROM {staging} {options}'.format(
+                scheme=self.pg_scheme, table=table, columns=columns, staging=staging, options=CONFLICT_OPTIONS[table]
+            ))
+            cur.execute('TRUNCATE {staging}'.format(staging=staging))
+
+    def __get_staging_table(self, table):
+        staging = 'staging_{table}'.format(table=table)
+        with self.connection.cursor() as cur:
+            cur.execute('CREATE TEMP TABLE IF NOT EXISTS {staging} (LIKE {scheme}.{table} INCLUDING DEFAULTS)'.format(
+                staging=staging, scheme=self.pg_scheme, table=table
+            ))
+        return staging
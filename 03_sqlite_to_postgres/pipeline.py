@@ -0,0 +1,139 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+
+from adapters import get_row_adapter
+from loaders import ExtractedBatch, SQLiteLoader
+
+logger = logging.getLogger(__name__)
+
+STAGE_READ = 'read'
+STAGE_TRANSFORM = 'transform'
+STAGE_WRITE = 'write'
+
+_DONE = object()
+
+
+@dataclass
+class StageCounters:
+    """busy -- время работы стадии, waiting -- время ожидания соседних стадий через очереди"""
+    busy: float = 0.0
+    waiting: float = 0.0
+    batches: int = 0
+
+    def as_dict(self):
+        return {'busy': round(self.busy, 3), 'waiting': round(self.waiting, 3), 'batches': self.batches}
+
+
+@dataclass
+class PipelinedExtractor:
+    """Конвейер чтение -> подготовка -> запись, стадии которого работают одновременно.
+
+    Чтение из SQLite и подготовка пачек идут в отдельных потоках и передают данные через очереди
+    глубиной queue_depth; стадия записи -- это поток, который потребляет extract(). Пока Postgres
+    пишет одну пачку, следующие уже читаются и готовятся, а заполненная очередь останавливает чтение.
+    """
+    sqlite_path: str
+    batch_size: int = field(default=1000)
+    queue_depth: int = field(default=4)
+    saver_class: type | None = field(default=None)
+    counters: dict = field(default_factory=dict)
+
+    def extract(self, table: str, after_rowid: int | None = None):
+        counters = {stage: StageCounters() for stage in (STAGE_READ, STAGE_TRANSFORM, STAGE_WRITE)}
+        self.counters[table] = counters
+        stop = threading.Event()
+        raw = queue.Queue(maxsize=self.queue_depth)
+        prepared = queue.Queue(maxsize=self.queue_depth)
+        threads = [
+            threading.Thread(target=self.__read, args=(table, after_rowid, raw, stop, counters[STAGE_READ]),
+                             daemon=True),
+            threading.Thread(target=self.__transform, args=(table, raw, prepared, stop, counters[STAGE_TRANSFORM]),
+                             daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+
+        write = counters[STAGE_WRITE]
+        try:
+            while True:
+                started = time.perf_counter()
+                item = prepared.get()
+                write.waiting += time.perf_counter() - started
+                if item is _DONE:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                started = time.perf_counter()
+                yield item
+                write.busy += time.perf_counter() - started
+                write.batches += 1
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            logger.info('%s: pipeline %s', table, {stage: c.as_dict() for stage, c in counters.items()})
+
+    def __read(self, table, after_rowid, output, stop, counters):
+        try:
+            connection = sqlite3.connect(self.sqlite_path)
+            try:
+                batches = SQLiteLoader(connection, self.batch_size).fetchmany(table, after_rowid)
+                while True:
+                    started = time.perf_counter()
+                    batch = next(batches, None)
+                    counters.busy += time.perf_counter() - started
+                    if batch is None:
+                        break
+                    counters.batches += 1
+                    if not self.__put(output, batch, stop, counters):
+                        return
+            finally:
+                connection.close()
+        except Exception as e:
+            self.__put(output, e, stop, counters)
+            return
+        self.__put(output, _DONE, stop, counters)
+
+    def __transform(self, table, source, output, stop, counters):
+        adapter = get_row_adapter(table)
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                item = source.get(timeout=0.1)
+            except queue.Empty:
+                counters.waiting += time.perf_counter() - started
+                continue
+            counters.waiting += time.perf_counter() - started
+            if item is _DONE or isinstance(item, BaseException):
+                self.__put(output, item, stop, counters)
+                return
+            started = time.perf_counter()
+            try:
+                data = self.saver_class.prepare(table, item) if self.saver_class else item
+                batch = ExtractedBatch(adapter.rowid(item[-1]), len(item), data, prepared=self.saver_class is not None)
+            except Exception as e:
+                self.__put(output, e, stop, counters)
+                return
+            counters.busy += time.perf_counter() - started
+            counters.batches += 1
+            if not self.__put(output, batch, stop, counters):
+                return
+
+    @staticmethod
+    def __put(output, item, stop, counters) -> bool:
+        """Передача в очередь, пока следующая стадия не остановлена; False, если конвейер остановлен"""
+        started = time.perf_counter()
+        try:
+            while not stop.is_set():
+                try:
+                    output.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            counters.waiting += time.perf_counter() - started
@@ -7,6 +7,9 @@ TABLE_GENRE_FILMWORK = 'genre_film_work'
 TABLE_PERSON_FILMWORK = 'person_film_work'
 
 PG_SCHEME = 'content'
+CHECKPOINT_TABLE = 'loader_checkpoint'
+ROW_HASH_TABLE = 'loader_row_hash'
+DEFERRED_DDL_TABLE = 'loader_deferred_ddl'
 
 TABLES_MAPPING = {
     TABLE_GENRE: Genre,
@@ -15,3 +18,19 @@ TABLES_MAPPING = {
     TABLE_GENRE_FILMWORK: GenreFilmwork,
     TABLE_PERSON_FILMWORK: PersonFilmwork
 }
+
+
+def _get_conflict_options(model):
+    fields = (f for f in model.__dataclass_fields__ if f != 'id')
+    return 'ON CONFLICT (id) DO UPDATE SET {0}'.format(', '.join('{0}=EXCLUDED.{0}'.format(f) for f in fields))
+
+
+# Повторная загрузка переписывает строку целиком, чтобы в Postgres не оставались устаревшие значения
+CONFLICT_OPTIONS = {table: _get_conflict_options(model) for table, model in TABLES_MAPPING.items()}
+
+# Таблицы-связи, строки которых удаляются вместе с удалённой строкой основной таблицы
+DEPENDENT_TABLES = {
+    TABLE_GENRE: ((TABLE_GENRE_FILMWORK, 'genre_id'),),
+    TABLE_PERSON: ((TABLE_PERSON_FILMWORK, 'person_id'),),
+    TABLE_FILMWORK: ((TABLE_GENRE_FILMWORK, 'film_work_id'), (TABLE_PERSON_FILMWORK, 'film_work_id')),
+}
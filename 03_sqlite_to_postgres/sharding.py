@@ -0,0 +1,67 @@
+import sqlite3
+from collections import deque
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+
+from loaders import ExtractedBatch, SQLiteLoader
+
+# Соединения с SQLite, открытые в процессе пула; переиспользуются между заданиями
+_connections = {}
+
+
+def get_rowid_ranges(connection: sqlite3.Connection, table: str, width: int, after_rowid: int | None = None):
+    """Диапазоны rowid (lo, hi] шириной width, покрывающие оставшиеся строки таблицы без пропусков"""
+    query, params = 'SELECT MIN(rowid), MAX(rowid) FROM {table}'.format(table=table), ()
+    if after_rowid is not None:
+        query, params = query + ' WHERE rowid > ?', (after_rowid,)
+    min_rowid, max_rowid = connection.execute(query, params).fetchone()
+    if min_rowid is None:
+        return
+    start = min_rowid - 1 if after_rowid is None else after_rowid
+    for lo in range(start, max_rowid, width):
+        yield lo, min(lo + width, max_rowid)
+
+
+def extract_range(sqlite_path: str, table: str, lo: int, hi: int, saver_class=None) -> tuple[int, object]:
+    """Чтение диапазона rowid (lo, hi] в процессе пула и, если задан saver_class, подготовка его к записи"""
+    if sqlite_path not in _connections:
+        _connections[sqlite_path] = sqlite3.connect(sqlite_path)
+    rows = [row for batch in SQLiteLoader(_connections[sqlite_path]).fetchmany(table, lo, hi) for row in batch]
+    if saver_class and rows:
+        return len(rows), saver_class.prepare(table, rows)
+    return len(rows), rows
+
+
+@dataclass
+class ShardedExtractor:
+    """Чтение таблиц SQLite диапазонами rowid в пуле процессов.
+
+    Диапазоны шириной batch_size читаются и готовятся к записи параллельно; одновременно в работе
+    не больше queue_depth диапазонов, так что медленная запись в Postgres приостанавливает чтение.
+    Результаты отдаются в порядке rowid, поэтому контрольная точка остаётся обычным last_rowid.
+    """
+    sqlite_path: str
+    executor: Executor
+    batch_size: int = field(default=1000)
+    queue_depth: int = field(default=8)
+    saver_class: type | None = field(default=None)
+
+    def extract(self, table: str, after_rowid: int | None = None):
+        connection = sqlite3.connect(self.sqlite_path)
+        pending = deque()
+        try:
+            for lo, hi in get_rowid_ranges(connection, table, self.batch_size, after_rowid):
+                pending.append((hi, self.executor.submit(extract_range, self.sqlite_path, table, lo, hi,
+                                                         self.saver_class)))
+                if len(pending) >= self.queue_depth:
+                    yield self.__get_batch(*pending.popleft())
+            while pending:
+                yield self.__get_batch(*pending.popleft())
+        finally:
+            connection.close()
+            for _, future in pending:
+                future.cancel()
+
+    def __get_batch(self, hi, future) -> ExtractedBatch:
+        rows, data = future.result()
+        return ExtractedBatch(hi, rows, data, prepared=bool(self.saver_class and rows))
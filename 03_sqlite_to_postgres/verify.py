@@ -0,0 +1,94 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import psycopg2
+from consistency import CHUNK_SIZE, ConsistencyChecker, TableDiff, get_compared_fields
+from dotenv import load_dotenv
+from psycopg2.extensions import make_dsn
+from settings import TABLES_MAPPING
+from utils import sqlite_conn_context
+
+load_dotenv()
+
+
+def get_id_ranges(connection: sqlite3.Connection, table: str, parts: int) -> list[tuple[str | None, str | None]]:
+    """Деление таблицы на parts диапазонов id (after_id, until_id] примерно равного размера"""
+    count = connection.execute('SELECT COUNT(*) FROM {table}'.format(table=table)).fetchone()[0]
+    bounds = []
+    for part in range(1, parts if count >= parts else 1):
+        row = connection.execute('SELECT id FROM {table} ORDER BY id LIMIT 1 OFFSET ?'.format(table=table),
+                                 (count * part // parts - 1,)).fetchone()
+        bounds.append(row[0])
+    # Крайние диапазоны не ограничены, чтобы лишние строки Postgres за границами SQLite тоже попали в проверку
+    return list(zip([None, *bounds], [*bounds, None]))
+
+
+def verify_range(sqlite_path: str, dsn: str, table: str, after_id: str | None, until_id: str | None,
+                 chunk_size: int) -> TableDiff:
+    """Проверка одного диапазона в процессе пула со своими соединениями"""
+    sqlite_connection = sqlite3.connect(sqlite_path)
+    pg_connection = psycopg2.connect(dsn)
+    try:
+        checker = ConsistencyChecker(sqlite_connection, pg_connection, chunk_size)
+        return checker.compare_table(table, after_id, until_id)
+    finally:
+        pg_connection.close()
+        sqlite_connection.close()
+
+
+def verify(sqlite_path: str, dsn: str, tables: list[str], workers: int, ranges: int,
+           chunk_size: int = CHUNK_SIZE) -> list[TableDiff]:
+    with sqlite_conn_context(sqlite_path) as connection:
+        tasks = [(table, after_id, until_id) for table in tables
+                 for after_id, until_id in get_id_ranges(connection, table, ranges)]
+
+    diffs = {table: TableDiff(table, get_compared_fields(table)) for table in tables}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [(table, executor.submit(verify_range, sqlite_path, dsn, table, after_id, until_id, chunk_size))
+                   for table, after_id, until_id in tasks]
+        for table, future in futures:
+            diffs[table].merge(future.result())
+    return list(diffs.values())
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Проверка совпадения данных SQLite и Postgres')
+    parser.add_argument('--sqlite', default='db.sqlite', help='путь к базе SQLite')
+    parser.add_argument('--dsn', default=None,
+                        help='строка подключения к Postgres; по умолчанию собирается из переменных DB_*')
+    parser.add_argument('--tables', default=','.join(TABLES_MAPPING), help='таблицы через запятую')
+    parser.add_argument('--workers', type=int, default=len(TABLES_MAPPING), help='число процессов проверки')
+    parser.add_argument('--ranges', type=int, default=1,
+                        help='на сколько диапазонов id делить каждую таблицу для параллельной проверки')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('-o', '--output', default=None, help='файл для JSON-отчёта; по умолчанию stdout')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    dsn = args.dsn or make_dsn(dbname=os.getenv('DB_NAME'),
+                               user=os.getenv('DB_USER'),
+                               password=os.getenv('DB_PASSWORD'),
+                               host=os.getenv('DB_HOST', '127.0.0.1'),
+                               port=os.getenv('DB_PORT', 5432))
+
+    started = time.perf_counter()
+    diffs = verify(args.sqlite, dsn, args.tables.split(','), args.workers, args.ranges, args.chunk_size)
+    report = {
+        'consistent': all(diff.is_consistent for diff in diffs),
+        'elapsed': round(time.perf_counter() - started, 3),
+        'tables': [diff.as_dict() for diff in diffs],
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+    sys.exit(0 if report['consistent'] else 1)
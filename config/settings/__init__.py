@@ -9,6 +9,7 @@ _base_settings = (
     'components/common.py',
     'components/database.py',
     'components/drf.py',
+    'components/cache.py',
 
     # Select the right env:
     'environments/{0}.py'.format(_ENV),
@@ -0,0 +1,14 @@
+from config.settings.components import config
+
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+# Local-memory LRU by default; point CACHE_BACKEND at FileBasedCache or RedisCache to share it between workers.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', ''),
+        'TIMEOUT': config('CACHE_TIMEOUT', 300, cast=int),
+        'OPTIONS': {
+            'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', 1000, cast=int),
+        },
+    },
+}
@@ -1 +1,5 @@
 CREATE SCHEMA content;
+
+-- Test databases are copied from template1, the models live in the content schema
+\c template1
+CREATE SCHEMA content;
@@ -1,4 +1,8 @@
+import uuid
+
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
 
 from .models import Filmwork, Genre, GenreFilmwork, Person, PersonFilmwork
 
@@ -20,13 +24,32 @@ class GenreAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at', 'updated_at')
 
 
+class EstimatedCountPaginator(Paginator):
+    # Below this the planner estimate is unreliable, and an exact count is cheap anyway
+    exact_count_threshold = 10000
+
+    @cached_property
+    def count(self):
+        estimate = self.object_list.estimated_count()
+        return estimate if estimate > self.exact_count_threshold else self.object_list.count()
+
+
 @admin.register(Filmwork)
 class FilmworkAdmin(admin.ModelAdmin):
     inlines = (GenreFilmworkInline, PersonFilmworkInline)
     list_display = ('title', 'type', 'creation_date', 'rating')
     list_filter = ('type',)
-    search_fields = ('title', 'description', 'id')
+    search_fields = ('title', 'description')
     readonly_fields = ('created_at', 'updated_at')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        try:
+            film_work_id = uuid.UUID(search_term.strip())
+        except ValueError:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(pk=film_work_id), False
 
 
 @admin.register(Person)
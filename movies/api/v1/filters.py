@@ -0,0 +1,74 @@
+from django_filters import rest_framework as filters
+from rest_framework.filters import OrderingFilter
+
+from movies.models import CREATION_ORDER, PERSON_NAMES, UNDATED, FilmworkDocument
+
+
+class FilmworkFilter(filters.FilterSet):
+    rating = filters.RangeFilter()
+    creation_date = filters.DateFromToRangeFilter(method='filter_creation_date')
+    genre = filters.CharFilter(method='filter_genre')
+    person = filters.CharFilter(method='filter_person')
+
+    class Meta:
+        model = FilmworkDocument
+        fields = ('type',)
+
+    def filter_creation_date(self, queryset, name, value):
+        """Range over the expression the creation order index is built on, so that index serves the filter too.
+
+        Undated films sort under the UNDATED stand-in, which stays out of any range as it would on the raw column.
+        """
+        if not (value.start or value.stop):
+            return queryset
+        queryset = queryset.alias(creation_order=CREATION_ORDER)
+        if value.start:
+            queryset = queryset.filter(creation_order__gte=value.start)
+        else:
+            queryset = queryset.filter(creation_order__gt=UNDATED)
+        if value.stop:
+            queryset = queryset.filter(creation_order__lte=value.stop)
+        return queryset
+
+    def filter_genre(self, queryset, name, value):
+        return queryset.filter(genres__contains=[value])
+
+    def filter_person(self, queryset, name, value):
+        return queryset.alias(person_names=PERSON_NAMES).filter(person_names__contains=[value])
+
+
+class FilmworkOrderingFilter(OrderingFilter):
+    """Ordering that keyset pagination can page through.
+
+    `id` is appended so the order is total, search results default to descending rank,
+    and `creation_date` is ordered through a non-null annotation matching its index.
+    """
+    annotations = {'creation_date': ('creation_order', CREATION_ORDER)}
+    tiebreaker = 'id'
+
+    def get_ordering(self, request, queryset, view):
+        params = request.query_params.get(self.ordering_param)
+        fields = []
+        if params:
+            fields = self.remove_invalid_fields(queryset, [param.strip() for param in params.split(',')], view,
+                                                request)
+        if not fields and 'rank' in queryset.query.annotations:
+            fields = ['-rank']
+        ordering = [self.get_ordering_field(field) for field in fields]
+        # The tiebreaker follows the leading direction so that one (field, id) index scan serves the whole order
+        descending = ordering and ordering[0].startswith('-')
+        return (*ordering, '-' + self.tiebreaker if descending else self.tiebreaker)
+
+    def get_ordering_field(self, field):
+        name = field.lstrip('-')
+        if name in self.annotations:
+            return field.replace(name, self.annotations[name][0])
+        return field
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view)
+        names = {field.lstrip('-') for field in ordering}
+        for alias, expression in self.annotations.values():
+            if alias in names:
+                queryset = queryset.annotate(**{alias: expression})
+        return queryset.order_by(*ordering)
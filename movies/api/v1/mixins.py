@@ -0,0 +1,111 @@
+import hashlib
+import inspect
+
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.exceptions import ValidationError
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response, set_response_etag
+from django.utils.http import urlencode
+
+from movies.cache import aget_movies_version
+
+
+class AsyncDispatchMixin:
+    """Dispatch in the event loop, so handlers may be coroutines that await the async ORM.
+
+    DRF only dispatches synchronously: this is `APIView.dispatch` with awaited handlers. Sync handlers
+    such as OPTIONS run as they are and must not query the database.
+    """
+
+    @classmethod
+    def as_view(cls, *args, **initkwargs):
+        # Django calls a view marked as a coroutine function in the event loop instead of a thread
+        return markcoroutinefunction(super().as_view(*args, **initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            # Tokens and sessions are looked up in the database; `initial` then reuses the user
+            await sync_to_async(self.perform_authentication)(request)
+            self.initial(request, *args, **kwargs)
+            method = request.method.lower()
+            handler = self.http_method_not_allowed
+            if method in self.http_method_names:
+                handler = getattr(self, method, self.http_method_not_allowed)
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def aget_object(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (queryset.model.DoesNotExist, TypeError, ValueError, ValidationError):
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        return await self.paginator.apaginate_queryset(queryset, self.request, view=self)
+
+
+class CachedResponseMixin:
+    """Serve repeated GET requests from the cache with ETag support until the movies data changes.
+
+    Only JSON is cached: the browsable API page carries the user name and a CSRF token.
+    Goes before `AsyncDispatchMixin`, whose dispatch it awaits.
+    """
+    cache_timeout = DEFAULT_TIMEOUT
+    cached_media_types = ('application/json',)
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return await super().dispatch(request, *args, **kwargs)
+
+        key = build_cache_key(request, await aget_movies_version())
+        cached = await cache.aget(key)
+        if cached is None:
+            response = await super().dispatch(request, *args, **kwargs)
+            if response.status_code != 200 or response.streaming or not self.is_cacheable(response):
+                return response
+            response.render()
+            set_response_etag(response)
+            await cache.aset(key, (response.content, dict(response.items())), self.cache_timeout)
+        else:
+            response = restore_response(cached)
+        return get_conditional_response(request, etag=response['ETag'], response=response)
+
+    def is_cacheable(self, response):
+        # Checked before rendering, which for other renderers is left to Django's thread
+        return response.accepted_renderer.media_type in self.cached_media_types
+
+
+def build_cache_key(request, version):
+    """Pagination links are absolute, so the scheme and host are part of the key along with the query."""
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    raw_key = '{0}://{1}{2}?{3}|{4}'.format(
+        request.scheme, request.get_host(), request.path, query, request.META.get('HTTP_ACCEPT', ''))
+    return 'movies:response:{0}:{1}'.format(version, hashlib.md5(raw_key.encode()).hexdigest())
+
+
+def restore_response(cached):
+    content, headers = cached
+    response = HttpResponse(content)
+    for header, value in headers.items():
+        response[header] = value
+    return response
@@ -1,5 +1,14 @@
+import json
+from base64 import b64decode, b64encode
+from urllib import parse
+
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.db.models import F, Func, Q, Value
 from rest_framework import pagination
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class SimplePageNumberPaginator(pagination.PageNumberPagination):
@@ -11,3 +20,143 @@ class SimplePageNumberPaginator(pagination.PageNumberPagination):
             'total_pages': self.page.paginator.num_pages,
             'results': data
         })
+
+
+def reverse_ordering(ordering):
+    return tuple(field[1:] if field.startswith('-') else '-' + field for field in ordering)
+
+
+class Row(Func):
+    """SQL row constructor `(a, b, ...)`, only meant to be compared with another row."""
+    template = '(%(expressions)s)'
+    output_field = models.Field()
+
+
+class KeysetPaginator(pagination.CursorPagination):
+    """Cursor pagination over a unique ordering: no COUNT(*) and no OFFSET for deep pages.
+
+    The cursor holds every ordering value of the boundary row and the next page starts right after it,
+    `(rating, id) > (%s, %s)`, so long runs of equal ratings or titles page like any other rows.
+    The total is reported only on request (`?count=1`) and is a planner estimate.
+    Views with an ordering filter take the ordering from it, so it must end with a unique field.
+    """
+    ordering = 'id'
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.get_page_queryset(queryset, request, view)
+        if page_queryset is None:
+            return None
+        if self.count_requested(request):
+            self.count = queryset.estimated_count()
+        return self.set_page(list(page_queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.get_page_queryset(queryset, request, view)
+        if page_queryset is None:
+            return None
+        if self.count_requested(request):
+            self.count = await queryset.aestimated_count()
+        return self.set_page([row async for row in page_queryset])
+
+    def count_requested(self, request):
+        return request.query_params.get(self.count_query_param) in ('1', 'true')
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """Rows of the requested page, one extra included: it tells whether there is a page beyond this one."""
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.count = None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.position_names = [field.lstrip('-') for field in self.ordering]
+        self.position_fields = [self.get_output_field(queryset, name) for name in self.position_names]
+        self.cursor = self.decode_cursor(request)
+
+        self.reverse = self.cursor is not None and self.cursor.reverse
+        ordering = reverse_ordering(self.ordering) if self.reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            queryset = queryset.filter(self.get_position_filter(ordering, self.cursor.position))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        self.page = results[:self.page_size]
+        has_following = len(results) > self.page_size
+        if self.reverse:
+            self.page.reverse()
+        self.has_next = bool(self.page) and (self.reverse or has_following)
+        self.has_previous = bool(self.page) and (has_following if self.reverse else self.cursor is not None)
+        self.display_page_controls = (self.has_next or self.has_previous) and self.template is not None
+        return self.page
+
+    @staticmethod
+    def get_output_field(queryset, name):
+        annotation = queryset.query.annotations.get(name)
+        return annotation.output_field if annotation is not None else queryset.model._meta.get_field(name)
+
+    def get_position_filter(self, ordering, position):
+        """Rows after `position` in `ordering`: one row comparison when all directions agree, as indexes expect."""
+        descending = [field.startswith('-') for field in ordering]
+        if len(set(descending)) == 1:
+            values = [Value(value, output_field=field) for value, field in zip(position, self.position_fields)]
+            return Func(Row(*map(F, self.position_names)), Row(*values), template='%(expressions)s',
+                        arg_joiner=' < ' if descending[0] else ' > ', output_field=models.BooleanField())
+        # Mixed directions: (a > x) OR (a = x AND b < y) OR ...
+        condition = Q()
+        for i, name in enumerate(self.position_names):
+            lookup = '{0}__{1}'.format(name, 'lt' if descending[i] else 'gt')
+            condition |= Q(**dict(zip(self.position_names[:i], position[:i])), **{lookup: position[i]})
+        return condition
+
+    def get_position(self, item):
+        if isinstance(item, dict):
+            return tuple(item[name] for name in self.position_names)
+        return tuple(getattr(item, name) for name in self.position_names)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(pagination.Cursor(0, reverse=False, position=self.get_position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(pagination.Cursor(0, reverse=True, position=self.get_position(self.page[0])))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            tokens = parse.parse_qs(b64decode(encoded.encode('ascii')).decode('ascii'), keep_blank_values=True)
+            reverse = bool(int(tokens.get('r', ['0'])[0]))
+            values = json.loads(tokens['p'][0])
+            if not isinstance(values, list) or len(values) != len(self.position_fields):
+                raise ValueError('The cursor does not match the ordering')
+            position = tuple(field.to_python(value) for field, value in zip(self.position_fields, values))
+        except (KeyError, TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return pagination.Cursor(offset=0, reverse=reverse, position=position)
+
+    def encode_cursor(self, cursor):
+        tokens = {'p': json.dumps(cursor.position, default=str)}
+        if cursor.reverse:
+            tokens['r'] = '1'
+        encoded = b64encode(parse.urlencode(tokens).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_paginated_response(self, data):
+        response = {
+            'next': self.get_next_link(),
+            'prev': self.get_previous_link(),
+        }
+        if self.count is not None:
+            response['count'] = self.count
+        response['results'] = data
+        return Response(response)
+
+
+class ChangesPaginator(KeysetPaginator):
+    ordering = 'change_seq'
@@ -0,0 +1,40 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+LINE_SEPARATOR = '\u2028'.encode()
+PARAGRAPH_SEPARATOR = '\u2029'.encode()
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Lets clients ask for newline-delimited JSON; the streamed body is produced by the view itself."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer that encodes with orjson when it is installed and the settings allow it."""
+    orjson_options = orjson and orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not self.use_orjson(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self.orjson_options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # The stdlib renderer escapes these for JavaScript string literals, see JSONRenderer.render
+        return ret.replace(LINE_SEPARATOR, b'\\u2028').replace(PARAGRAPH_SEPARATOR, b'\\u2029')
+
+    def use_orjson(self, accepted_media_type, renderer_context):
+        return (orjson is not None and not self.ensure_ascii and self.compact and self.strict
+                and not self.get_indent(accepted_media_type, renderer_context))
@@ -1,15 +1,63 @@
 from rest_framework import serializers
 
-from movies.models import Filmwork
+from movies.models import FilmworkDocument
 
 
-class FilmworkSerializer(serializers.ModelSerializer):
-    genres = serializers.SlugRelatedField(many=True, read_only=True, slug_field='name')
-    actors = serializers.SlugRelatedField(many=True, read_only=True, slug_field='full_name')
-    directors = serializers.SlugRelatedField(many=True, read_only=True, slug_field='full_name')
-    writers = serializers.SlugRelatedField(many=True, read_only=True, slug_field='full_name')
+class SparseFieldsetMixin:
+    """Limit the output to comma-separated `?fields=` and drop `?exclude=`; unknown names are ignored."""
+    fields_param = 'fields'
+    exclude_param = 'exclude'
 
+    @classmethod
+    def get_sparse_field_names(cls, request):
+        names = cls.Meta.fields
+        fields = cls.parse_field_names(request, cls.fields_param)
+        if fields:
+            names = tuple(name for name in names if name in fields)
+        exclude = cls.parse_field_names(request, cls.exclude_param)
+        return tuple(name for name in names if name not in exclude)
+
+    @staticmethod
+    def parse_field_names(request, param):
+        return {name.strip() for name in request.query_params.get(param, '').split(',') if name.strip()}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is not None:
+            selected = self.get_sparse_field_names(request)
+            for name in set(self.fields) - set(selected):
+                self.fields.pop(name)
+
+
+class FilmworkDocumentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
-        model = Filmwork
+        model = FilmworkDocument
         fields = ('id', 'title', 'description', 'creation_date', 'rating', 'type',
                   'genres', 'actors', 'directors', 'writers')
+
+
+class FilmworkChangeSerializer(FilmworkDocumentSerializer):
+    class Meta(FilmworkDocumentSerializer.Meta):
+        fields = FilmworkDocumentSerializer.Meta.fields + ('change_seq', 'updated_at', 'deleted_at')
+
+
+class BatchRequestSerializer(serializers.Serializer):
+    max_ids = 500
+
+    ids = serializers.ListField(child=serializers.UUIDField(), allow_empty=False, max_length=max_ids)
+
+
+class RowSerializer:
+    """Serialize `values_list(named=True)` rows straight into dicts, without model instances or DRF fields.
+
+    Output fields must come first in each row; trailing values (cursor positions) are left out.
+    The JSON encoder renders uuids and datetimes exactly as the model serializers do.
+    """
+
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+
+    def to_representation(self, rows):
+        fields = self.fields
+        return [dict(zip(fields, row)) for row in rows]
@@ -4,7 +4,7 @@ from rest_framework import routers
 from movies.api.v1 import views
 
 router = routers.DefaultRouter()
-router.register(r'movies', views.FilmworkViewSet)
+router.register(r'movies', views.FilmworkViewSet, basename='filmwork')
 
 urlpatterns = [
     path('', include(router.urls)),
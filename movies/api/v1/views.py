@@ -1,17 +1,116 @@
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import permissions
-from rest_framework.viewsets import ModelViewSet
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.viewsets import ReadOnlyModelViewSet
 
 from movies.api.v1 import serializer
-from movies.api.v1.paginators import SimplePageNumberPaginator
-from movies.models import Filmwork
+from movies.api.v1.filters import FilmworkFilter, FilmworkOrderingFilter
+from movies.api.v1.mixins import AsyncDispatchMixin, CachedResponseMixin
+from movies.api.v1.paginators import ChangesPaginator, KeysetPaginator
+from movies.api.v1.renderers import NDJSONRenderer
+from movies.export import aiter_films_ndjson
+from movies.models import FilmworkDocument
 
 
-class FilmworkViewSet(ModelViewSet):
-    queryset = Filmwork.objects.all()
-    serializer_class = serializer.FilmworkSerializer
-    http_method_names = ['get']
+class FilmworkViewSet(CachedResponseMixin, AsyncDispatchMixin, ReadOnlyModelViewSet):
+    queryset = FilmworkDocument.objects.live()
+    serializer_class = serializer.FilmworkDocumentSerializer
+    http_method_names = ['get', 'post']
     permission_classes = [permissions.AllowAny]
-    pagination_class = SimplePageNumberPaginator
+    pagination_class = KeysetPaginator
+    filter_backends = (DjangoFilterBackend, FilmworkOrderingFilter)
+    filterset_class = FilmworkFilter
+    ordering_fields = ('rating', 'creation_date', 'title')
+    search_param = 'search'
 
     def get_queryset(self):
-        return super().get_queryset().order_by('id').prefetch_genre().prefetch_roles()
+        queryset = super().get_queryset().defer('search_vector').order_by('id')
+        if self.is_sparse():
+            queryset = queryset.only(*self.get_loaded_fields())
+        search = self.request.query_params.get(self.search_param, '').strip()
+        return queryset.search(search) if search and self.action == 'list' else queryset
+
+    async def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        fields = self.get_serializer_class().get_sparse_field_names(request)
+        # The cursor paginator reads its position from each row, so ordering columns are fetched as well
+        ordering = FilmworkOrderingFilter().get_ordering(request, queryset, self)
+        positions = [name for name in dict.fromkeys(field.lstrip('-') for field in ordering) if name not in fields]
+        page = await self.apaginate_queryset(queryset.values_list(*fields, *positions, named=True))
+        return self.get_paginated_response(serializer.RowSerializer(fields).to_representation(page))
+
+    async def retrieve(self, request, *args, **kwargs):
+        return Response(self.get_serializer(await self.aget_object()).data)
+
+    @action(detail=False, methods=['get', 'post'])
+    async def batch(self, request):
+        """Films for `?ids=a,b` or a POSTed `{"ids": [...]}`, in request order; unknown ids are listed as missing."""
+        ids = self.get_batch_ids(request)
+        fields = self.get_serializer_class().get_sparse_field_names(request)
+        positions = () if 'id' in fields else ('id',)
+        films = self.get_queryset().by_ids(ids).order_by().values_list(*fields, *positions, named=True)
+        rows = {row.id: row async for row in films}
+        return Response({
+            'results': serializer.RowSerializer(fields).to_representation(rows[pk] for pk in ids if pk in rows),
+            'missing': [pk for pk in ids if pk not in rows],
+        })
+
+    @staticmethod
+    def get_batch_ids(request):
+        if request.method == 'POST':
+            data = request.data
+        else:
+            data = {'ids': [pk for value in request.query_params.getlist('ids') for pk in value.split(',') if pk]}
+        batch = serializer.BatchRequestSerializer(data=data)
+        batch.is_valid(raise_exception=True)
+        return list(dict.fromkeys(batch.validated_data['ids']))
+
+    def is_sparse(self):
+        serializer_class = self.get_serializer_class()
+        params = self.request.query_params
+        return serializer_class.fields_param in params or serializer_class.exclude_param in params
+
+    def get_loaded_fields(self):
+        """Columns for the requested fields plus those the paginator reads to build its cursor."""
+        fields = {'id', *self.get_serializer_class().get_sparse_field_names(self.request)}
+        ordering = self.pagination_class.ordering
+        fields.update(field.lstrip('-') for field in ((ordering,) if isinstance(ordering, str) else ordering))
+        requested = self.request.query_params.get(FilmworkOrderingFilter.ordering_param, '').split(',')
+        fields.update(field.strip().lstrip('-') for field in requested
+                      if field.strip().lstrip('-') in self.ordering_fields)
+        return fields
+
+    @action(detail=False, renderer_classes=[NDJSONRenderer, *api_settings.DEFAULT_RENDERER_CLASSES])
+    def export(self, request):
+        return StreamingHttpResponse(aiter_films_ndjson(), content_type='application/x-ndjson')
+
+    @action(detail=False, queryset=FilmworkDocument.objects.all(), serializer_class=serializer.FilmworkChangeSerializer,
+            pagination_class=ChangesPaginator, filter_backends=())
+    async def changes(self, request):
+        """Documents written after `?since=`, tombstones of deleted films included, in change number order.
+
+        `since` is the last `change_seq` the client has seen, which resumes the feed exactly. An ISO 8601
+        datetime is accepted for a first sync and starts from the documents written after that moment.
+        """
+        page = await self.apaginate_queryset(self.get_queryset().filter(self.get_since_filter(request)))
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    @staticmethod
+    def get_since_filter(request):
+        since = request.query_params.get('since', '').strip()
+        if since.isdigit():
+            return Q(change_seq__gt=int(since))
+        try:
+            moment = parse_datetime(since)
+        except ValueError:
+            moment = None
+        if moment is None:
+            raise ValidationError({'since': 'A change number or an ISO 8601 datetime is required.'})
+        return Q(updated_at__gt=timezone.make_aware(moment) if timezone.is_naive(moment) else moment)
@@ -0,0 +1,13 @@
+from asgiref.sync import sync_to_async
+from django.db.models import Max
+
+from movies.models import FilmworkDocument
+
+
+def get_movies_version():
+    """Newest document change number: it is read from the database, so every process sees a change at once."""
+    return FilmworkDocument.objects.aggregate(version=Max('change_seq'))['version'] or 0
+
+
+async def aget_movies_version():
+    return await sync_to_async(get_movies_version)()
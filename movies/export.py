@@ -0,0 +1,22 @@
+from movies.api.v1.renderers import FastJSONRenderer
+from movies.models import FilmworkDocument
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+def get_export_queryset():
+    return FilmworkDocument.objects.live().order_by('id').values(*FilmworkDocument.DocumentManager.document_fields)
+
+
+def iter_films_ndjson(chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield every film document as a JSON line, read through a server-side cursor in `chunk_size` rows."""
+    renderer = FastJSONRenderer()
+    for film in get_export_queryset().iterator(chunk_size=chunk_size):
+        yield renderer.render(film) + b'\n'
+
+
+async def aiter_films_ndjson(chunk_size=EXPORT_CHUNK_SIZE):
+    """Async `iter_films_ndjson`: the event loop waits on the client between chunks, no thread is held."""
+    renderer = FastJSONRenderer()
+    async for film in get_export_queryset().aiterator(chunk_size=chunk_size):
+        yield renderer.render(film) + b'\n'
@@ -0,0 +1,70 @@
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from movies.api.v1.renderers import FastJSONRenderer, orjson
+
+
+def make_page(page_size, cast_size):
+    """A list page shaped like the movies endpoint response, with `cast_size` names in every role."""
+    started = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+    def names(prefix):
+        return ['{0} {1}'.format(prefix, random.randrange(100000)) for _ in range(cast_size)]
+
+    return {
+        'next': 'http://localhost/api/v1/movies/?cursor=cD0yMDIx',
+        'prev': None,
+        'results': [{
+            'id': uuid.uuid4(),
+            'title': 'Film {0}'.format(i),
+            'description': 'Описание фильма ' * 20,
+            'creation_date': started + timedelta(days=random.randrange(20000), microseconds=random.randrange(10 ** 6)),
+            'rating': round(random.uniform(0, 10), 1),
+            'type': 'movie',
+            'genres': names('Genre')[:3],
+            'actors': names('Actor'),
+            'directors': names('Director')[:2],
+            'writers': names('Writer')[:3],
+        } for i in range(page_size)],
+    }
+
+
+def check_same_bytes(name, body, expected):
+    """Timing a renderer only makes sense if it writes exactly what the stdlib renderer writes."""
+    if body == expected:
+        return
+    offset = next((i for i, (a, b) in enumerate(zip(body, expected)) if a != b), min(len(body), len(expected)))
+    raise CommandError('{0} output differs from stdlib at byte {1}: {2!r} != {3!r}'.format(
+        name, offset, body[offset - 20:offset + 20], expected[offset - 20:offset + 20]))
+
+
+class Command(BaseCommand):
+    help = 'Measure encode time per movies list page for the stdlib and orjson renderers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--cast-sizes', default='10,100,500', help='Comma-separated names per role')
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        renderers = {'stdlib': JSONRenderer(), 'fast': FastJSONRenderer()}
+        results = []
+        for cast_size in map(int, options['cast_sizes'].split(',')):
+            page = make_page(options['page_size'], cast_size)
+            expected = renderers['stdlib'].render(page)
+            for name, renderer in renderers.items():
+                check_same_bytes(name, renderer.render(page), expected)
+                started = time.perf_counter()
+                for _ in range(options['repeat']):
+                    body = renderer.render(page)
+                elapsed = (time.perf_counter() - started) / options['repeat']
+                results.append({'renderer': name, 'cast_size': cast_size, 'page_size': options['page_size'],
+                                'bytes': len(body), 'ms_per_page': round(elapsed * 1000, 3)})
+        report = {'orjson': orjson.__version__ if orjson else None, 'results': results}
+        self.stdout.write(json.dumps(report, indent=2))
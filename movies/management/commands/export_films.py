@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from movies.export import EXPORT_CHUNK_SIZE, iter_films_ndjson
+
+
+class Command(BaseCommand):
+    help = 'Export all films with genres and role-split persons as NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-o', '--output', help='File to write to; stdout when omitted')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        lines = iter_films_ndjson(options['chunk_size'])
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            output.writelines(lines)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from movies.models import FilmworkDocument
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized film documents read by the API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', help='Film ids to refresh; all films when omitted')
+
+    def handle(self, *args, **options):
+        FilmworkDocument.objects.refresh(options['ids'] or None)
+        self.stdout.write(self.style.SUCCESS('Film documents refreshed'))
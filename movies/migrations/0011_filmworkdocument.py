@@ -0,0 +1,55 @@
+# Generated by Django 4.0.4 on 2026-10-18 06:20
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+PERSONS_BY_ROLE = """
+    ARRAY(SELECT p.full_name FROM content.person p
+          JOIN content.person_film_work pfw ON pfw.person_id = p.id
+          WHERE pfw.film_work_id = fw.id AND pfw.role = '{role}' ORDER BY p.full_name)
+"""
+
+POPULATE_DOCUMENTS = """
+INSERT INTO content.film_work_document
+    (id, title, description, creation_date, rating, type, genres, actors, directors, writers, updated_at)
+SELECT fw.id, fw.title, fw.description, fw.creation_date, fw.rating, fw.type,
+       ARRAY(SELECT g.name FROM content.genre g
+             JOIN content.genre_film_work gfw ON gfw.genre_id = g.id
+             WHERE gfw.film_work_id = fw.id ORDER BY g.name),
+       {actors}, {directors}, {writers}, NOW()
+FROM content.film_work fw;
+""".format(actors=PERSONS_BY_ROLE.format(role='actor'),
+           directors=PERSONS_BY_ROLE.format(role='director'),
+           writers=PERSONS_BY_ROLE.format(role='writer'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0010_alter_personfilmwork_film_work_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FilmworkDocument',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=255, verbose_name='title')),
+                ('description', models.TextField(blank=True, null=True, verbose_name='description')),
+                ('creation_date', models.DateTimeField(blank=True, null=True, verbose_name='creation_date')),
+                ('rating', models.FloatField(default=0, verbose_name='rating')),
+                ('type', models.CharField(choices=[('movie', 'movie'), ('tv_show', 'tv_show')], max_length=10, verbose_name='type')),
+                ('genres', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=255), default=list, size=None)),
+                ('actors', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=255), default=list, size=None)),
+                ('directors', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=255), default=list, size=None)),
+                ('writers', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=255), default=list, size=None)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Документ кинопроизведения',
+                'verbose_name_plural': 'Документы кинопроизведений',
+                'db_table': 'content"."film_work_document',
+            },
+        ),
+        migrations.RunSQL(POPULATE_DOCUMENTS, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.0.4 on 2026-10-18 06:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0011_filmworkdocument'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='filmworkdocument',
+            index=models.Index(fields=['updated_at', 'id'], name='film_work_document_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.0.4 on 2026-10-18 06:35
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0012_filmworkdocument_updated_idx'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='filmwork',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('title'), name='gin_trgm_ops'), name='film_work_title_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='filmwork',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('description'), name='gin_trgm_ops'), name='film_work_description_trgm_idx'),
+        ),
+    ]
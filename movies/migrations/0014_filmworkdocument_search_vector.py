@@ -0,0 +1,32 @@
+# Generated by Django 4.0.4 on 2026-10-18 06:36
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+POPULATE_SEARCH_VECTOR = """
+UPDATE content.film_work_document SET search_vector =
+    setweight(to_tsvector('english', COALESCE(title, '')), 'A')
+    || setweight(to_tsvector('english', array_to_string(genres || actors || directors || writers, ' ')), 'B')
+    || setweight(to_tsvector('english', COALESCE(description, '')), 'C')
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0013_filmwork_trgm_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='filmworkdocument',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(POPULATE_SEARCH_VECTOR, reverse_sql=migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='filmworkdocument',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='film_work_document_search_idx'),
+        ),
+    ]
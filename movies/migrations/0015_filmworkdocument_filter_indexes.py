@@ -0,0 +1,44 @@
+# Generated by Django 4.0.4 on 2026-10-18 06:38
+
+import datetime
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+import django.db.models.expressions
+import django.db.models.functions.comparison
+from django.db import migrations, models
+from django.utils.timezone import utc
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0014_filmworkdocument_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='filmworkdocument',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['genres'], name='film_work_document_genres_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='filmworkdocument',
+            index=django.contrib.postgres.indexes.GinIndex(django.db.models.expressions.Func(django.db.models.expressions.F('actors'), django.db.models.expressions.F('directors'), django.db.models.expressions.F('writers'), arg_joiner=' || ', output_field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=255), size=None), template='(%(expressions)s)'), name='film_work_document_persons_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='filmworkdocument',
+            index=models.Index(fields=['rating', 'id'], name='film_work_document_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='filmworkdocument',
+            index=models.Index(fields=['type', 'rating', 'id'], name='film_work_document_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='filmworkdocument',
+            index=models.Index(fields=['title', 'id'], name='film_work_document_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='filmworkdocument',
+            index=models.Index(django.db.models.functions.comparison.Coalesce('creation_date', django.db.models.expressions.Value(datetime.datetime(1, 1, 1, 0, 0, tzinfo=utc))), django.db.models.expressions.F('id'), name='film_work_document_created_idx'),
+        ),
+    ]
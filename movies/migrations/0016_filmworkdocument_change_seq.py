@@ -0,0 +1,44 @@
+# Generated by Django 4.0.4 on 2026-10-18 07:20
+
+from django.db import migrations, models
+
+import movies.models
+
+CREATE_SEQUENCE = 'CREATE SEQUENCE content.film_work_document_change_seq'
+DROP_SEQUENCE = 'DROP SEQUENCE content.film_work_document_change_seq'
+
+# Existing documents are numbered in the order they were last written; the sequence continues after them
+NUMBER_DOCUMENTS = """
+UPDATE content.film_work_document d SET change_seq = o.n
+FROM (SELECT id, row_number() OVER (ORDER BY updated_at, id) AS n FROM content.film_work_document) o
+WHERE d.id = o.id;
+SELECT setval('content.film_work_document_change_seq',
+              COALESCE((SELECT MAX(change_seq) FROM content.film_work_document), 0) + 1, false);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0015_filmworkdocument_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_SEQUENCE, reverse_sql=DROP_SEQUENCE),
+        migrations.AddField(
+            model_name='filmworkdocument',
+            name='change_seq',
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+        migrations.RunSQL(NUMBER_DOCUMENTS, reverse_sql=migrations.RunSQL.noop),
+        migrations.AlterField(
+            model_name='filmworkdocument',
+            name='change_seq',
+            field=models.BigIntegerField(default=movies.models.next_change_seq, editable=False, unique=True),
+        ),
+        migrations.AddField(
+            model_name='filmworkdocument',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -1,8 +1,17 @@
+from datetime import datetime, timezone
+
+from django.contrib.postgres.expressions import ArraySubquery
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
-from django.db.models import Prefetch
+from django.db import connection, models, transaction
+from django.db.models import F, Func, Lookup, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, Now, Upper
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 
+from movies.managers import EstimatedCountQuerySet
 from movies.mixins import TimeStampedMixin, UUIDMixin
 
 
@@ -36,23 +45,28 @@ class Filmwork(UUIDMixin, TimeStampedMixin):
         MOVIE = 'movie', 'movie'
         TV_SHOW = 'tv_show', 'tv_show'
 
-    class AdvancedManager(models.QuerySet):
+    class AdvancedManager(EstimatedCountQuerySet):
         def prefetch_genre(self):
             return self.prefetch_related('genres')
 
         def prefetch_roles(self):
-            qs = self.all()
-            persons = Person.objects.all()
+            """Load person links of all films in one query; `actors`, `directors` and `writers` split them by role."""
+            links = PersonFilmwork.objects.select_related('person').order_by('person__full_name')
+            return self.prefetch_related(Prefetch('personfilmworks', links, to_attr='person_links'))
+
+        def annotate_relations(self):
+            """Collect genre and role-split person names as arrays within the film query itself."""
+            genres = Genre.objects.filter(genrefilmwork__film_work=OuterRef('pk')).order_by('name')
+            qs = self.annotate(genre_names=ArraySubquery(genres.values('name')))
             maps = {
-                'actors': PersonFilmwork.Roles.ACTOR,
-                'directors': PersonFilmwork.Roles.DIRECTOR,
-                'writers': PersonFilmwork.Roles.WRITER,
+                'actor_names': PersonFilmwork.Roles.ACTOR,
+                'director_names': PersonFilmwork.Roles.DIRECTOR,
+                'writer_names': PersonFilmwork.Roles.WRITER,
             }
-            for to_attr, role in maps.items():
-                qs = qs.prefetch_related(Prefetch('persons',
-                                                  persons.filter(personfilmworks__role=role).distinct(),
-                                                  to_attr=to_attr)
-                                         )
+            for name, role in maps.items():
+                persons = Person.objects.filter(personfilmworks__film_work=OuterRef('pk'),
+                                                personfilmworks__role=role).order_by('full_name')
+                qs = qs.annotate(**{name: ArraySubquery(persons.values('full_name'))})
             return qs
 
     objects = AdvancedManager.as_manager()
@@ -72,10 +86,37 @@ class Filmwork(UUIDMixin, TimeStampedMixin):
         db_table = 'content"."film_work'
         verbose_name = 'Кинопроизведение'
         verbose_name_plural = 'Кинопроизведения'
+        # Admin search compares UPPER(field) for icontains, so the trigram indexes are built on that expression
+        indexes = (
+            GinIndex(OpClass(Upper('title'), name='gin_trgm_ops'), name='film_work_title_trgm_idx'),
+            GinIndex(OpClass(Upper('description'), name='gin_trgm_ops'), name='film_work_description_trgm_idx'),
+        )
 
     def __str__(self):
         return self.title
 
+    @cached_property
+    def persons_by_role(self):
+        links = getattr(self, 'person_links', None)
+        if links is None:
+            links = self.personfilmworks.select_related('person').order_by('person__full_name')
+        roles = {role: [] for role in PersonFilmwork.Roles.values}
+        for link in links:
+            roles.setdefault(link.role, []).append(link.person)
+        return roles
+
+    @property
+    def actors(self):
+        return self.persons_by_role[PersonFilmwork.Roles.ACTOR]
+
+    @property
+    def directors(self):
+        return self.persons_by_role[PersonFilmwork.Roles.DIRECTOR]
+
+    @property
+    def writers(self):
+        return self.persons_by_role[PersonFilmwork.Roles.WRITER]
+
 
 class GenreFilmwork(UUIDMixin):
     film_work = models.ForeignKey(Filmwork, on_delete=models.CASCADE)
@@ -105,3 +146,154 @@ class PersonFilmwork(UUIDMixin):
     class Meta:
         db_table = 'content"."person_film_work'
         unique_together = (('film_work', 'person'),)
+
+
+# Expressions shared by the document indexes and the API filters and orderings that must match them
+PERSON_NAMES = Func(F('actors'), F('directors'), F('writers'), arg_joiner=' || ', template='(%(expressions)s)',
+                    output_field=ArrayField(models.CharField(max_length=255)))
+# Keyset pagination needs a non-null position, so films without a date sort as the earliest ones
+UNDATED = datetime(1, 1, 1, tzinfo=timezone.utc)
+CREATION_ORDER = Coalesce('creation_date', Value(UNDATED))
+
+
+@models.UUIDField.register_lookup
+class AnyLookup(Lookup):
+    """`field = ANY(%s)`: the list is passed as one array parameter, so the query text does not grow with it."""
+    lookup_name = 'any'
+
+    def get_prep_lookup(self):
+        return [self.lhs.output_field.get_prep_value(value) for value in self.rhs]
+
+    def get_db_prep_lookup(self, value, connection):
+        field = self.lhs.output_field
+        return '%s', [[field.get_db_prep_value(item, connection, prepared=True) for item in value]]
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return '{0} = ANY({1})'.format(lhs, rhs), (*lhs_params, *rhs_params)
+
+
+# Documents take change numbers from this sequence; refreshes serialize on the lock while they do
+CHANGE_SEQUENCE = 'content.film_work_document_change_seq'
+CHANGE_LOCK = 7301
+NEXT_CHANGE = Func(Value(CHANGE_SEQUENCE), function='nextval', output_field=models.BigIntegerField())
+
+
+def next_change_seq():
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT nextval(%s)', [CHANGE_SEQUENCE])
+        return cursor.fetchone()[0]
+
+
+class FilmworkDocument(models.Model):
+    """Denormalized copy of a film with its genre and role-split person names, read by the API."""
+
+    class DocumentManager(EstimatedCountQuerySet):
+        source_fields = ('id', 'title', 'description', 'creation_date', 'rating', 'type',
+                         'genre_names', 'actor_names', 'director_names', 'writer_names')
+        document_fields = ('id', 'title', 'description', 'creation_date', 'rating', 'type',
+                           'genres', 'actors', 'directors', 'writers')
+        search_config = 'english'
+
+        def refresh(self, film_work_ids=None):
+            """Rebuild documents of the given films (of all films if omitted) from the normalized tables.
+
+            Documents are upserted by one `INSERT ... SELECT ... ON CONFLICT (id) DO UPDATE`, so concurrent
+            refreshes of the same film do not collide; documents of deleted films are kept as tombstones.
+            Only new and changed documents are written and take the next change number, so refreshing an
+            unchanged catalogue adds nothing to the changes feed. Refreshes hold a transaction lock while
+            they do, so change numbers become visible in the order they were taken and a reader of the
+            changes feed never steps past a number that is still to be committed.
+            """
+            documents = self.live()
+            # Existing documents take a new number in the update, and only if they change
+            current_change = self.model.objects.filter(pk=OuterRef('pk')).values('change_seq')
+            films = Filmwork.objects.annotate_relations().annotate(
+                search_vector=self.get_search_vector(names=self.source_fields[6:]), refreshed_at=Now(),
+                change=Coalesce(Subquery(current_change), NEXT_CHANGE), not_deleted=Value(None, models.DateTimeField()))
+            if film_work_ids is not None:
+                film_work_ids = list(film_work_ids)
+                if not film_work_ids:
+                    return
+                films = films.filter(pk__in=film_work_ids)
+                documents = documents.filter(pk__in=film_work_ids)
+            rows = films.order_by().values_list(*self.source_fields, 'search_vector', 'refreshed_at', 'change',
+                                                'not_deleted')
+            select, params = rows.query.sql_with_params()
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s)', [CHANGE_LOCK])
+                cursor.execute(self.get_upsert_sql(select), (*params, CHANGE_SEQUENCE))
+                documents.exclude(pk__in=Filmwork.objects.values('pk')).update(
+                    deleted_at=Now(), updated_at=Now(), change_seq=NEXT_CHANGE)
+
+        def get_upsert_sql(self, select):
+            """Upsert of the documents `select` returns; a conflicting row is updated only if it differs."""
+            table = connection.ops.quote_name(self.model._meta.db_table)
+            names = (*self.document_fields, 'search_vector', 'updated_at', 'change_seq', 'deleted_at')
+            columns = [self.model._meta.get_field(name).column for name in names]
+            compared = [self.model._meta.get_field(name).column for name in (*self.document_fields[1:], 'deleted_at')]
+            updates = ['{0} = EXCLUDED.{0}'.format(column) for column in columns[1:] if column != 'change_seq']
+            return ('INSERT INTO {table} ({columns}) {select} ON CONFLICT (id) DO UPDATE SET {updates}, '
+                    'change_seq = nextval(%s) WHERE ({current}) IS DISTINCT FROM ({excluded})').format(
+                table=table, columns=', '.join(columns), select=select, updates=', '.join(updates),
+                current=', '.join('{0}.{1}'.format(table, column) for column in compared),
+                excluded=', '.join('EXCLUDED.{0}'.format(column) for column in compared))
+
+        def get_search_vector(self, title='title', names=('genres', 'actors', 'directors', 'writers'),
+                              description='description'):
+            """Title ranks above person and genre names, which rank above the description."""
+            names = Func(*map(F, names), arg_joiner=' || ', template="array_to_string(%(expressions)s, ' ')",
+                         output_field=models.TextField())
+            return (SearchVector(title, weight='A', config=self.search_config)
+                    + SearchVector(names, weight='B', config=self.search_config)
+                    + SearchVector(description, weight='C', config=self.search_config))
+
+        def live(self):
+            """Documents of existing films, without the tombstones kept for the changes feed."""
+            return self.filter(deleted_at__isnull=True)
+
+        def by_ids(self, ids):
+            """Documents with the given ids, matched through one `id = ANY(array)` parameter."""
+            return self.filter(id__any=list(ids))
+
+        def search(self, text):
+            """Matching documents annotated with `rank`; websearch syntax (quotes, `or`, `-`) is accepted."""
+            query = SearchQuery(text, config=self.search_config, search_type='websearch')
+            # ts_rank is real: cast it so the rank survives a round trip through a pagination cursor exactly
+            rank = Cast(SearchRank(F('search_vector'), query), output_field=models.FloatField())
+            return self.filter(search_vector=query).annotate(rank=rank)
+
+    objects = DocumentManager.as_manager()
+    id = models.UUIDField(primary_key=True, editable=False)
+    title = models.CharField(_('title'), max_length=255)
+    description = models.TextField(_('description'), blank=True, null=True)
+    creation_date = models.DateTimeField(_('creation_date'), blank=True, null=True)
+    rating = models.FloatField(_('rating'), default=0)
+    type = models.CharField(_('type'), max_length=10, choices=Filmwork.FilworkTypes.choices)
+    genres = ArrayField(models.CharField(max_length=255), default=list)
+    actors = ArrayField(models.CharField(max_length=255), default=list)
+    directors = ArrayField(models.CharField(max_length=255), default=list)
+    writers = ArrayField(models.CharField(max_length=255), default=list)
+    search_vector = SearchVectorField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    change_seq = models.BigIntegerField(unique=True, default=next_change_seq, editable=False)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        db_table = 'content"."film_work_document'
+        verbose_name = 'Документ кинопроизведения'
+        verbose_name_plural = 'Документы кинопроизведений'
+        indexes = (
+            models.Index(fields=('updated_at', 'id'), name='film_work_document_updated_idx'),
+            GinIndex(fields=('search_vector',), name='film_work_document_search_idx'),
+            GinIndex(fields=('genres',), name='film_work_document_genres_idx'),
+            GinIndex(PERSON_NAMES, name='film_work_document_persons_idx'),
+            models.Index(fields=('rating', 'id'), name='film_work_document_rating_idx'),
+            models.Index(fields=('type', 'rating', 'id'), name='film_work_document_type_idx'),
+            models.Index(fields=('title', 'id'), name='film_work_document_title_idx'),
+            models.Index(CREATION_ORDER, F('id'), name='film_work_document_created_idx'),
+        )
+
+    def __str__(self):
+        return self.title
@@ -0,0 +1,87 @@
+import logging
+from threading import local
+
+from django.db import DatabaseError, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from movies.models import Filmwork, FilmworkDocument, Genre, GenreFilmwork, Person, PersonFilmwork
+
+logger = logging.getLogger(__name__)
+
+# Films changed by the current transaction of this thread; connections are per thread as well
+_pending = local()
+
+
+def refresh_documents_on_commit(film_work_ids):
+    film_work_ids = set(film_work_ids)
+    if film_work_ids:
+        # Films whose refresh failed after an earlier commit are retried along with this one
+        get_pending_ids().update(film_work_ids, getattr(_pending, 'failed_ids', ()))
+        _pending.failed_ids = set()
+        transaction.on_commit(refresh_pending_documents)
+
+
+def get_pending_ids():
+    if not hasattr(_pending, 'ids'):
+        _pending.ids = set()
+    return _pending.ids
+
+
+def refresh_pending_documents():
+    """Every change schedules this callback; the first one to run refreshes all films the transaction touched.
+
+    Ids left over from a rolled back transaction are refreshed with the next commit, which is harmless.
+    The changes are already committed when this runs, so a failed refresh keeps its ids for the next commit
+    instead of failing the request; `refresh_film_documents` catches up on the documents left stale meanwhile.
+    """
+    film_work_ids = get_pending_ids()
+    if film_work_ids:
+        _pending.ids = set()
+        try:
+            FilmworkDocument.objects.refresh(film_work_ids)
+        except DatabaseError:
+            _pending.failed_ids = film_work_ids
+            logger.exception('Failed to refresh documents of %d films', len(film_work_ids))
+
+
+@receiver((post_save, post_delete), sender=Filmwork)
+def filmwork_changed(sender, instance, **kwargs):
+    refresh_documents_on_commit([instance.pk])
+
+
+@receiver((post_save, post_delete), sender=GenreFilmwork)
+@receiver((post_save, post_delete), sender=PersonFilmwork)
+def film_work_link_changed(sender, instance, **kwargs):
+    refresh_documents_on_commit([instance.film_work_id])
+
+
+@receiver(m2m_changed, sender=GenreFilmwork)
+@receiver(m2m_changed, sender=PersonFilmwork)
+def film_work_links_set(sender, instance, action, reverse, pk_set, **kwargs):
+    """`film.genres.add()` and the like write links with bulk_create, which sends no post_save."""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            refresh_documents_on_commit([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        refresh_documents_on_commit(pk_set)
+    elif action == 'pre_clear':
+        refresh_documents_on_commit(
+            sender.objects.filter(**{instance._meta.model_name: instance}).values_list('film_work_id', flat=True)
+        )
+
+
+@receiver(post_save, sender=Genre)
+def genre_changed(sender, instance, created, **kwargs):
+    if not created:
+        refresh_documents_on_commit(
+            GenreFilmwork.objects.filter(genre=instance).values_list('film_work_id', flat=True)
+        )
+
+
+@receiver(post_save, sender=Person)
+def person_changed(sender, instance, created, **kwargs):
+    if not created:
+        refresh_documents_on_commit(
+            PersonFilmwork.objects.filter(person=instance).values_list('film_work_id', flat=True).distinct()
+        )
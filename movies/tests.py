@@ -0,0 +1,481 @@
+import asyncio
+import json
+import uuid
+from datetime import datetime, timezone
+from unittest import skipIf
+from unittest.mock import patch
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import resolve, reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from movies.api.v1.mixins import build_cache_key
+from movies.api.v1.paginators import KeysetPaginator
+from movies.api.v1.renderers import FastJSONRenderer, orjson
+from movies.models import (CREATION_ORDER, Filmwork, FilmworkDocument, Genre, GenreFilmwork, Person,
+                           PersonFilmwork)
+
+
+class PrefetchRolesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        actor, director = Person.objects.create(full_name='Actor'), Person.objects.create(full_name='Director')
+        for i in range(3):
+            film = Filmwork.objects.create(title='Film {0}'.format(i))
+            PersonFilmwork.objects.create(film_work=film, person=actor, role=PersonFilmwork.Roles.ACTOR)
+            PersonFilmwork.objects.create(film_work=film, person=director, role=PersonFilmwork.Roles.DIRECTOR)
+
+    def test_roles_are_split_from_one_query(self):
+        with self.assertNumQueries(2):
+            roles = [([p.full_name for p in film.actors], [p.full_name for p in film.directors], film.writers)
+                     for film in Filmwork.objects.prefetch_roles()]
+        self.assertEqual(roles, [(['Actor'], ['Director'], [])] * 3)
+
+
+@skipIf(orjson is None, 'orjson is not installed')
+class FastJSONRendererTests(SimpleTestCase):
+    def assertSameBytes(self, data):
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_api_values(self):
+        self.assertSameBytes({
+            'id': uuid.UUID(int=1),
+            'creation_date': datetime(2020, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc),
+            'rating': 7.5,
+            'title': 'Фильм',
+            'genres': ['Drama'],
+            'next': None,
+        })
+
+    def test_line_separators_are_escaped(self):
+        self.assertSameBytes({'description': 'line\u2028paragraph\u2029end'})
+
+    def test_out_of_range_integer_falls_back(self):
+        self.assertSameBytes({'count': 2 ** 70})
+
+    def test_indented_output_falls_back(self):
+        data = {'title': 'Film', 'rating': 7.5}
+        context = {'indent': 4}
+        self.assertEqual(FastJSONRenderer().render(data, renderer_context=context),
+                         JSONRenderer().render(data, renderer_context=context))
+
+    def test_known_differences(self):
+        """Left as orjson writes them: floats with an exponent and NaN, which the stdlib refuses as strict JSON."""
+        self.assertEqual(FastJSONRenderer().render({'rating': 1e16}), b'{"rating":1e16}')
+        self.assertEqual(JSONRenderer().render({'rating': 1e16}), b'{"rating":1e+16}')
+        self.assertEqual(FastJSONRenderer().render({'rating': float('nan')}), b'{"rating":null}')
+
+
+class DocumentRefreshTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.genre = Genre.objects.create(name='Drama')
+        cls.actor = Person.objects.create(full_name='Actor')
+        cls.director = Person.objects.create(full_name='Director')
+
+    def create_film(self):
+        film = Filmwork.objects.create(title='Film', rating=7)
+        GenreFilmwork.objects.create(film_work=film, genre=self.genre)
+        PersonFilmwork.objects.create(film_work=film, person=self.actor, role=PersonFilmwork.Roles.ACTOR)
+        PersonFilmwork.objects.create(film_work=film, person=self.director, role=PersonFilmwork.Roles.DIRECTOR)
+        return film
+
+    def test_transaction_refreshes_documents_once(self):
+        with patch.object(FilmworkDocument.DocumentManager, 'refresh') as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                films = [self.create_film(), self.create_film()]
+        refresh.assert_called_once_with({film.pk for film in films})
+
+    def test_document_follows_film(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            film = self.create_film()
+        document = FilmworkDocument.objects.get(pk=film.pk)
+        self.assertEqual((document.genres, document.actors, document.directors), (['Drama'], ['Actor'], ['Director']))
+        self.assertTrue(FilmworkDocument.objects.search('actor').filter(pk=film.pk).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            film.title = 'Renamed'
+            film.save()
+        self.assertEqual(FilmworkDocument.objects.get(pk=film.pk).title, 'Renamed')
+
+        film_id = film.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            film.delete()
+        self.assertFalse(FilmworkDocument.objects.live().filter(pk=film_id).exists())
+        self.assertIsNotNone(FilmworkDocument.objects.get(pk=film_id).deleted_at)
+
+    def test_relation_managers_refresh_documents(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            film = Filmwork.objects.create(title='Film')
+        with self.captureOnCommitCallbacks(execute=True):
+            film.genres.add(self.genre)
+            film.persons.add(self.actor, through_defaults={'role': PersonFilmwork.Roles.ACTOR})
+        document = FilmworkDocument.objects.get(pk=film.pk)
+        self.assertEqual((document.genres, document.actors), (['Drama'], ['Actor']))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.genre.filmwork_set.clear()
+        self.assertEqual(FilmworkDocument.objects.get(pk=film.pk).genres, [])
+
+    def test_failed_refresh_is_retried_with_next_commit(self):
+        with patch.object(FilmworkDocument.DocumentManager, 'refresh', side_effect=DatabaseError) as refresh:
+            with self.assertLogs('movies.signals', 'ERROR'), self.captureOnCommitCallbacks(execute=True):
+                film = self.create_film()
+        refresh.assert_called_once_with({film.pk})
+        self.assertFalse(FilmworkDocument.objects.filter(pk=film.pk).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other = Filmwork.objects.create(title='Other')
+        self.assertEqual(set(FilmworkDocument.objects.values_list('pk', flat=True)), {film.pk, other.pk})
+
+    def test_refresh_rebuilds_existing_documents(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            film = self.create_film()
+        FilmworkDocument.objects.filter(pk=film.pk).update(title='Stale', actors=[])
+        FilmworkDocument.objects.refresh()
+        document = FilmworkDocument.objects.get(pk=film.pk)
+        self.assertEqual((document.title, document.actors), ('Film', ['Actor']))
+
+
+@override_settings(ALLOWED_HOSTS=['*'])
+class CachedResponseTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('viewer', password='password')
+        FilmworkDocument.objects.create(id=uuid.uuid4(), title='Film', type='movie')
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('filmwork-list')
+
+    def test_json_is_served_from_cache(self):
+        response = self.client.get(self.url)
+        FilmworkDocument.objects.update(title='Changed')
+        self.assertEqual(self.client.get(self.url).content, response.content)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_new_change_replaces_cached_pages(self):
+        response = self.client.get(self.url)
+        FilmworkDocument.objects.create(id=uuid.uuid4(), title='New', type='movie')
+        self.assertEqual(len(self.client.get(self.url).json()['results']), 2)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_browsable_api_is_not_cached(self):
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(self.url, HTTP_ACCEPT='text/html'), 'viewer')
+        self.client.logout()
+        response = self.client.get(self.url, HTTP_ACCEPT='text/html')
+        self.assertNotContains(response, 'viewer')
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_key_includes_scheme_and_host(self):
+        keys = set()
+        for host, secure in (('a.example', False), ('b.example', False), ('a.example', True)):
+            request = APIRequestFactory().get(self.url, HTTP_HOST=host, secure=secure)
+            keys.add(build_cache_key(request, 'version'))
+        self.assertEqual(len(keys), 3)
+
+
+def list_url(params):
+    return '{0}?{1}'.format(reverse('filmwork-list'), urlencode(params))
+
+
+@patch.object(KeysetPaginator, 'page_size', 3)
+class KeysetPaginationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        dated = datetime(2000, 1, 1, tzinfo=timezone.utc)
+        for i in range(10):
+            FilmworkDocument.objects.create(id=uuid.uuid4(), title='Same' if i < 7 else 'Film {0}'.format(i),
+                                            rating=5 if i < 8 else i, type='movie' if i % 2 else 'tv_show',
+                                            creation_date=dated if i % 3 == 0 else None)
+
+    def setUp(self):
+        cache.clear()
+
+    def walk(self, url, link='next'):
+        response = self.client.get(url)
+        pages = [response.data['results']]
+        while response.data[link]:
+            response = self.client.get(response.data[link])
+            pages.append(response.data['results'])
+        return pages, response
+
+    @staticmethod
+    def get_ids(pages):
+        return [str(film['id']) for page in pages for film in page]
+
+    @staticmethod
+    def get_expected_ids(params, ordering):
+        queryset = FilmworkDocument.objects.alias(creation_order=CREATION_ORDER)
+        if 'type' in params:
+            queryset = queryset.filter(type=params['type'])
+        return [str(pk) for pk in queryset.order_by(*ordering).values_list('id', flat=True)]
+
+    def test_orderings_page_through_ties(self):
+        cases = (
+            ({'ordering': 'rating'}, ('rating', 'id')),
+            ({'ordering': '-rating'}, ('-rating', '-id')),
+            ({'ordering': '-rating', 'type': 'movie'}, ('-rating', '-id')),
+            ({'ordering': 'title'}, ('title', 'id')),
+            ({'ordering': 'title,-rating'}, ('title', '-rating', 'id')),
+            ({'ordering': 'creation_date'}, ('creation_order', 'id')),
+            ({'ordering': '-creation_date'}, ('-creation_order', '-id')),
+        )
+        for params, ordering in cases:
+            with self.subTest(**params):
+                pages, last = self.walk(list_url(params))
+                self.assertEqual(self.get_ids(pages), self.get_expected_ids(params, ordering))
+                self.assertEqual([len(page) for page in pages[:-1]], [3] * (len(pages) - 1))
+
+                previous, first = self.walk(last.data['prev'], 'prev')
+                self.assertEqual(previous[::-1], pages[:-1])
+                self.assertIsNone(first.data['prev'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('filmwork-list'), {'ordering': 'rating', 'cursor': 'bm90IGEgY3Vyc29y'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_creation_date_range_leaves_out_undated_films(self):
+        for params in ({'creation_date_before': '2020-01-01'}, {'creation_date_after': '2000-01-01'},
+                       {'creation_date_after': '', 'creation_date_before': ''}):
+            with self.subTest(**params):
+                pages, _ = self.walk(list_url({**params, 'ordering': 'creation_date'}))
+                self.assertEqual(len(self.get_ids(pages)), 10 if params.get('creation_date_before') == '' else 4)
+
+    def test_search_pages_through_equal_ranks(self):
+        for title in ['Alien'] * 7 + ['Alien vs Alien'] * 2:
+            FilmworkDocument.objects.create(id=uuid.uuid4(), title=title, type='movie')
+        FilmworkDocument.objects.update(search_vector=FilmworkDocument.objects.get_search_vector())
+        pages, last = self.walk(list_url({'search': 'alien'}))
+        expected = FilmworkDocument.objects.search('alien').order_by('-rank', '-id').values_list('id', flat=True)
+        self.assertEqual(self.get_ids(pages), list(map(str, expected)))
+        previous, _ = self.walk(last.data['prev'], 'prev')
+        self.assertEqual(previous[::-1], pages[:-1])
+
+
+class FilmworkQueryTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.films = [
+            FilmworkDocument.objects.create(id=uuid.UUID(int=1), title='Alpha', rating=9, type='movie',
+                                            genres=['Drama'], actors=['Ann'], directors=['Dan']),
+            FilmworkDocument.objects.create(id=uuid.UUID(int=2), title='Beta', rating=7, type='tv_show',
+                                            genres=['Drama', 'Comedy'], writers=['Ann']),
+            FilmworkDocument.objects.create(id=uuid.UUID(int=3), title='Gamma', rating=5, type='movie',
+                                            genres=['Comedy'], directors=['Ann']),
+            FilmworkDocument.objects.create(id=uuid.UUID(int=4), title='Delta', rating=3, type='movie',
+                                            genres=['Action'], actors=['Bob']),
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def get_titles(self, params):
+        response = self.client.get(reverse('filmwork-list'), params)
+        self.assertEqual(response.status_code, 200)
+        return [film['title'] for film in response.json()['results']]
+
+    def test_filters_combine_with_orderings(self):
+        cases = (
+            ({'genre': 'Drama'}, ['Alpha', 'Beta']),
+            ({'genre': 'Comedy', 'ordering': '-rating'}, ['Beta', 'Gamma']),
+            ({'person': 'Ann', 'ordering': 'rating'}, ['Gamma', 'Beta', 'Alpha']),
+            ({'person': 'Ann', 'type': 'movie', 'ordering': 'title'}, ['Alpha', 'Gamma']),
+            ({'rating_min': 6, 'ordering': '-title'}, ['Beta', 'Alpha']),
+            ({'rating_min': 5, 'rating_max': 7, 'genre': 'Comedy', 'ordering': 'rating'}, ['Gamma', 'Beta']),
+            ({'type': 'movie', 'ordering': '-title'}, ['Gamma', 'Delta', 'Alpha']),
+            ({'genre': 'Western'}, []),
+        )
+        for params, titles in cases:
+            with self.subTest(**params):
+                self.assertEqual(self.get_titles(params), titles)
+
+    def test_fields_prune_list_and_detail(self):
+        response = self.client.get(reverse('filmwork-list'), {'fields': 'title,rating', 'ordering': '-rating'})
+        self.assertEqual(response.json()['results'][0], {'title': 'Alpha', 'rating': 9})
+
+        response = self.client.get(reverse('filmwork-list'), {'exclude': 'description,actors,directors,writers'})
+        fields = {'id', 'title', 'creation_date', 'rating', 'type', 'genres'}
+        self.assertEqual(set(response.json()['results'][0]), fields)
+
+        response = self.client.get(reverse('filmwork-detail', args=[self.films[1].pk]),
+                                   {'fields': 'id,genres,unknown'})
+        self.assertEqual(response.json(), {'id': str(self.films[1].pk), 'genres': ['Drama', 'Comedy']})
+
+    def test_sparse_pages_keep_their_cursor(self):
+        with patch.object(KeysetPaginator, 'page_size', 2):
+            response = self.client.get(reverse('filmwork-list'), {'fields': 'title', 'ordering': 'rating'})
+            titles = [film['title'] for film in response.json()['results']]
+            response = self.client.get(response.json()['next'])
+        self.assertEqual(titles + [film['title'] for film in response.json()['results']],
+                         ['Delta', 'Gamma', 'Beta', 'Alpha'])
+        self.assertEqual(set(response.json()['results'][0]), {'title'})
+
+
+class BatchTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ids = [str(FilmworkDocument.objects.create(id=uuid.uuid4(), title='Film {0}'.format(i)).pk)
+                   for i in range(3)]
+        cls.url = reverse('filmwork-batch')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_results_follow_request_order(self):
+        unknown = str(uuid.uuid4())
+        ids = [self.ids[2], unknown, self.ids[0], self.ids[2]]
+        for response in (self.client.get(self.url, {'ids': ','.join(ids)}),
+                         self.client.post(self.url, {'ids': ids}, format='json')):
+            with self.subTest(method=response.request['REQUEST_METHOD']):
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual([film['id'] for film in response.json()['results']], [self.ids[2], self.ids[0]])
+                self.assertEqual(response.json()['missing'], [unknown])
+
+    def test_get_accepts_repeated_ids(self):
+        response = self.client.get('{0}?ids={1}&ids={2},{3}'.format(self.url, *self.ids))
+        self.assertEqual([film['id'] for film in response.json()['results']], self.ids)
+
+    def test_fields_prune_results(self):
+        response = self.client.post('{0}?fields=title'.format(self.url), {'ids': self.ids[:1]}, format='json')
+        self.assertEqual(response.json()['results'], [{'title': 'Film 0'}])
+
+    def test_id_limit(self):
+        ids = [str(uuid.uuid4()) for _ in range(501)]
+        response = self.client.post(self.url, {'ids': ids[:500]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['missing']), 500)
+        self.assertEqual(self.client.post(self.url, {'ids': ids}, format='json').status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'ids': ','.join(ids)}).status_code, 400)
+
+    def test_invalid_requests(self):
+        for response in (self.client.get(self.url), self.client.get(self.url, {'ids': 'not-a-uuid'}),
+                         self.client.post(self.url, {'ids': []}, format='json')):
+            with self.subTest(method=response.request['REQUEST_METHOD']):
+                self.assertEqual(response.status_code, 400)
+
+
+@patch.object(KeysetPaginator, 'page_size', 3)
+class ChangesFeedTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('filmwork-changes')
+
+    def create_films(self, count):
+        with self.captureOnCommitCallbacks(execute=True):
+            return [Filmwork.objects.create(title='Film {0}'.format(i)) for i in range(count)]
+
+    def read_feed(self, since):
+        response = self.client.get(self.url, {'since': since})
+        changes = response.data['results']
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            changes += response.data['results']
+        return changes
+
+    def test_feed_pages_through_one_refresh(self):
+        films = self.create_films(8)
+        changes = self.read_feed(0)
+        self.assertEqual({change['id'] for change in changes}, {str(film.pk) for film in films})
+        self.assertEqual(len({change['updated_at'] for change in changes}), 1)
+        numbers = [change['change_seq'] for change in changes]
+        self.assertEqual(numbers, sorted(numbers))
+
+    def test_feed_resumes_after_change_number(self):
+        film, other = self.create_films(2)
+        film_id, other_id = str(film.pk), str(other.pk)
+        since = max(change['change_seq'] for change in self.read_feed(0))
+        self.assertEqual(self.read_feed(since), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            film.delete()
+            other.title = 'Renamed'
+            other.save()
+        changes = {change['id']: change for change in self.read_feed(since)}
+        self.assertEqual(set(changes), {film_id, other_id})
+        self.assertIsNotNone(changes[film_id]['deleted_at'])
+        self.assertEqual((changes[other_id]['title'], changes[other_id]['deleted_at']), ('Renamed', None))
+        self.assertEqual(self.client.get(reverse('filmwork-detail', args=[film_id])).status_code, 404)
+
+    def test_unchanged_documents_are_not_renumbered(self):
+        film, other = self.create_films(2)
+        since = max(change['change_seq'] for change in self.read_feed(0))
+        with self.captureOnCommitCallbacks(execute=True):
+            FilmworkDocument.objects.refresh()
+            other.save()
+        self.assertEqual(self.read_feed(since), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            GenreFilmwork.objects.create(film_work=film, genre=Genre.objects.create(name='Drama'))
+        changes = self.read_feed(since)
+        self.assertEqual([(change['id'], change['genres']) for change in changes], [(str(film.pk), ['Drama'])])
+        self.assertGreater(changes[0]['change_seq'], since)
+
+    def test_since_is_required(self):
+        self.create_films(1)
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        self.assertEqual(len(self.read_feed('2000-01-01T00:00:00Z')), 1)
+
+
+# Production middleware: the toolbar's check loads the user in a thread before the view
+@override_settings(MIDDLEWARE=[name for name in settings.MIDDLEWARE if not name.startswith('debug_toolbar.')])
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('viewer', password='password')
+        cls.film = FilmworkDocument.objects.create(id=uuid.uuid4(), title='Film', type='movie')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_routes_are_coroutines(self):
+        for name, args in (('filmwork-list', ()), ('filmwork-detail', [self.film.pk]), ('filmwork-export', ())):
+            self.assertTrue(asyncio.iscoroutinefunction(resolve(reverse(name, args=args)).func))
+
+    async def test_list_and_detail_in_event_loop(self):
+        response = await self.async_client.get(reverse('filmwork-list'))
+        self.assertEqual([film['title'] for film in response.json()['results']], ['Film'])
+        cached = await self.async_client.get(reverse('filmwork-list'), headers={'If-None-Match': response['ETag']})
+        self.assertEqual(cached.status_code, 304)
+        detail = await self.async_client.get(reverse('filmwork-detail', args=[self.film.pk]))
+        self.assertEqual(detail.json()['title'], 'Film')
+        missing = await self.async_client.get(reverse('filmwork-detail', args=[uuid.uuid4()]))
+        self.assertEqual(missing.status_code, 404)
+
+    async def test_session_user_is_loaded_outside_event_loop(self):
+        await sync_to_async(self.async_client.force_login)(self.user)
+        response = await self.async_client.get(reverse('filmwork-list'), headers={'Accept': 'text/html'})
+        self.assertContains(response, 'viewer')
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(5):
+            FilmworkDocument.objects.create(id=uuid.uuid4(), title='Film {0}'.format(i), type='movie')
+
+    async def read_export(self):
+        response = await self.async_client.get(reverse('filmwork-export'))
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return b''.join([chunk async for chunk in response.streaming_content]).splitlines()
+
+    async def test_lines_match_api(self):
+        film = await FilmworkDocument.objects.acreate(
+            id=uuid.uuid4(), title='Dated', type='movie', rating=7.5,
+            creation_date=datetime(2026, 10, 18, 7, 12, 8, 200773, timezone.utc))
+        lines = {json.loads(line)['id']: line for line in await self.read_export()}
+        detail = await self.async_client.get(reverse('filmwork-detail', args=[film.pk]))
+        self.assertEqual(lines[str(film.pk)], detail.content)
+
+    @patch('movies.export.EXPORT_CHUNK_SIZE', 2)
+    async def test_export_streams_in_chunks(self):
+        films = [json.loads(line) for line in await self.read_export()]
+        self.assertEqual(sorted(film['title'] for film in films), ['Film {0}'.format(i) for i in range(5)])
@@ -1,9 +1,17 @@
 import sqlite3
+import sys
+from pathlib import Path
 
 import psycopg2
 import pytest
 from psycopg2.extras import DictCursor
 
+# Модули загрузчика импортируются плоско, как при запуске из его каталога
+sys.path.append(str(Path(__file__).resolve().parents[2] / '03_sqlite_to_postgres'))
+
+# rowid строк таблицы genre в genre_sqlite; пропуски остаются от удалённых строк
+GENRE_ROWIDS = (1, 2, 3, 5, 8, 9, 10, 14, 15, 16, 17, 21, 22, 30)
+
 
 @pytest.fixture(scope='session')
 def sqlite_cursor():
@@ -13,8 +21,25 @@ def sqlite_cursor():
 
 
 @pytest.fixture(scope='session')
-def pg_cursor():
-    dsl = {'dbname': 'movies_database', 'user': 'app', 'password': '123qwe', 'host': '127.0.0.1',
-           'port': 5432}
-    connection = psycopg2.connect(**dsl, cursor_factory=DictCursor)
+def pg_dsl():
+    return {'dbname': 'movies_database', 'user': 'app', 'password': '123qwe', 'host': '127.0.0.1', 'port': 5432}
+
+
+@pytest.fixture(scope='session')
+def pg_cursor(pg_dsl):
+    connection = psycopg2.connect(**pg_dsl, cursor_factory=DictCursor)
     return connection.cursor()
+
+
+@pytest.fixture
+def genre_sqlite(tmp_path):
+    """Файл SQLite с одной таблицей genre, строки которой занимают GENRE_ROWIDS"""
+    path = str(tmp_path / 'genre.sqlite')
+    connection = sqlite3.connect(path)
+    connection.execute('CREATE TABLE genre (id TEXT PRIMARY KEY, name TEXT, description TEXT, created_at TEXT, '
+                       'updated_at TEXT)')
+    connection.executemany('INSERT INTO genre (rowid, id, name, description) VALUES (?, ?, ?, ?)',
+                           [(rowid, 'g{0:02}'.format(rowid), 'Genre {0}'.format(rowid), '') for rowid in GENRE_ROWIDS])
+    connection.commit()
+    connection.close()
+    return path
@@ -0,0 +1,27 @@
+from adapters import COPY_NULL, get_row_adapter
+
+
+class TestCopyLine:
+    """Строка в текстовом формате COPY: поля через табуляцию, служебные символы экранированы"""
+
+    def test_special_characters_are_escaped(self):
+        line = get_row_adapter('genre').copy_line((1, 'tab\there', 'now', 'now', 'new\nline\rback\\slash', 'g1'))
+        assert line == 'tab\\there\tnow\tnow\tnew\\nline\\rback\\\\slash\tg1\n'
+        assert line.count('\t') == 4 and line.count('\n') == 1
+
+    def test_none_is_null(self):
+        line = get_row_adapter('genre').copy_line((1, 'Drama', None, None, None, 'g1'))
+        assert line.split('\t') == ['Drama', COPY_NULL, COPY_NULL, COPY_NULL, 'g1\n']
+
+    def test_empty_string_is_not_null(self):
+        assert get_row_adapter('genre').copy_line((1, '', 'now', 'now', '', 'g1')) == '\tnow\tnow\t\tg1\n'
+
+    def test_non_text_values_are_not_escaped(self):
+        adapter = get_row_adapter('film_work')
+        row = (7, '2020-01-01', 'now', 'now', 'f1', 'Film', 'About\ta film', '', 8.5, 'movie')
+        assert adapter.copy_line(row) == '2020-01-01\tnow\tnow\tf1\tFilm\tAbout\\ta film\t\t8.5\tmovie\n'
+
+
+def test_prepare_drops_rowid():
+    rows = [(1, 'Drama', 'now', 'now', '', 'g1'), (2, 'Comedy', 'now', 'now', '', 'g2')]
+    assert get_row_adapter('genre').prepare(rows) == [row[1:] for row in rows]
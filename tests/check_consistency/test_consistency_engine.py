@@ -0,0 +1,129 @@
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from consistency import ConsistencyChecker, normalize_datetime
+
+GENRE_TABLE = 'CREATE TABLE genre (id TEXT PRIMARY KEY, name TEXT, description TEXT, created_at TEXT, updated_at TEXT)'
+FILM_WORK_TABLE = ('CREATE TABLE film_work (id TEXT PRIMARY KEY, title TEXT, description TEXT, creation_date TEXT, '
+                   'file_path TEXT, rating REAL, type TEXT, created_at TEXT, updated_at TEXT)')
+SQLITE_IDS = ['a1', 'b2', 'c3', 'd4', 'e5', 'f6']
+
+
+class StubPgCursor:
+    """Именованный курсор Postgres поверх SQLite: плейсхолдеры %s заменяются на ?"""
+
+    def __init__(self, connection):
+        self.cursor = connection.cursor()
+        self.itersize = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.cursor.close()
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+    def execute(self, query, params=()):
+        self.cursor.execute(query.replace('%s', '?'), params)
+
+
+class StubPgConnection:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def cursor(self, name=None):
+        return StubPgCursor(self.connection)
+
+
+def make_db(rows):
+    connection = sqlite3.connect(':memory:')
+    connection.execute(GENRE_TABLE)
+    connection.executemany('INSERT INTO genre (id, name, description) VALUES (?, ?, ?)', rows)
+    return connection
+
+
+def make_rows(ids):
+    return [(row_id, 'Genre ' + row_id, '') for row_id in ids]
+
+
+def compare(sqlite_rows, pg_rows, chunk_size=2, after_id=None, until_id=None):
+    checker = ConsistencyChecker(make_db(sqlite_rows), StubPgConnection(make_db(pg_rows)), chunk_size,
+                                 pg_scheme='main')
+    return checker.compare_table('genre', after_id, until_id)
+
+
+class TestChunkBoundaries:
+    @pytest.mark.parametrize('chunk_size', [1, 2, 3, 6, 10])
+    def test_equal_tables(self, chunk_size):
+        diff = compare(make_rows(SQLITE_IDS), make_rows(SQLITE_IDS), chunk_size)
+        assert diff.is_consistent
+        assert diff.mismatched_chunks == 0
+        assert (diff.sqlite_rows, diff.pg_rows) == (6, 6)
+
+    def test_pending_row_skips_chunk(self):
+        """Строка Postgres за границей следующей пачки не попадает в неё"""
+        diff = compare(make_rows(SQLITE_IDS), make_rows(['a1', 'b2', 'e5', 'f6']))
+        assert (diff.missing, diff.extra, diff.different) == (2, 0, 0)
+        assert diff.missing_ids == ['c3', 'd4']
+
+    def test_pending_row_skips_several_chunks(self):
+        diff = compare(make_rows(SQLITE_IDS), make_rows(['f6']), chunk_size=1)
+        assert (diff.missing, diff.extra) == (5, 0)
+
+    @pytest.mark.parametrize('chunk_size', [1, 2, 4])
+    def test_extra_rows(self, chunk_size):
+        diff = compare(make_rows(['b2', 'd4']), make_rows(['a1', 'b2', 'c3', 'd4', 'e5']), chunk_size)
+        assert (diff.missing, diff.extra) == (0, 3)
+        assert sorted(diff.extra_ids) == ['a1', 'c3', 'e5']
+
+    def test_different_row(self):
+        pg_rows = make_rows(SQLITE_IDS)
+        pg_rows[3] = ('d4', 'Renamed', '')
+        diff = compare(make_rows(SQLITE_IDS), pg_rows)
+        assert (diff.missing, diff.extra, diff.different) == (0, 0, 1)
+        assert diff.differences[0]['fields'] == {'name': {'sqlite': 'Genre d4', 'pg': 'Renamed'}}
+
+    def test_id_range(self):
+        diff = compare(make_rows(SQLITE_IDS), make_rows(['a1', 'b2', 'e5', 'f6']), after_id='b2', until_id='e5')
+        assert (diff.sqlite_rows, diff.pg_rows) == (3, 1)
+        assert (diff.missing, diff.extra) == (2, 0)
+
+
+class TestTypedColumns:
+    """Время и числа сравниваются по значению, а не по тексту каждой из баз"""
+
+    @staticmethod
+    def compare_films(sqlite_rows, pg_rows):
+        connections = []
+        for rows in (sqlite_rows, pg_rows):
+            connection = sqlite3.connect(':memory:')
+            connection.execute(FILM_WORK_TABLE)
+            connection.executemany('INSERT INTO film_work (id, title, creation_date, rating) VALUES (?, ?, ?, ?)',
+                                   rows)
+            connections.append(connection)
+        checker = ConsistencyChecker(connections[0], StubPgConnection(connections[1]), pg_scheme='main')
+        return checker.compare_table('film_work')
+
+    def test_same_moment_in_other_format(self):
+        sqlite_rows = [('a1', 'Film', '2026-10-18T07:12:08.200773+00:00', 7),
+                       ('b2', 'Film', '2021-06-16 20:14:09+00', 0),
+                       ('c3', 'Film', None, 8.5)]
+        pg_rows = [('a1', 'Film', '2026-10-18 07:12:08.200773+00:00', 7.0),
+                   ('b2', 'Film', '2021-06-16 23:14:09+03:00', None),
+                   ('c3', 'Film', None, 8.5)]
+        diff = self.compare_films(sqlite_rows, pg_rows)
+        assert diff.is_consistent
+        assert diff.mismatched_chunks == 0
+
+    def test_different_moment(self):
+        diff = self.compare_films([('a1', 'Film', '2026-10-18T07:12:08.200773+00:00', 7)],
+                                  [('a1', 'Film', '2026-10-18 07:12:08.2+00:00', 7)])
+        assert diff.different == 1
+        assert list(diff.differences[0]['fields']) == ['creation_date']
+
+    def test_postgres_datetime(self):
+        moment = datetime(2026, 10, 18, 10, 12, 8, 200773, tzinfo=timezone(timedelta(hours=3)))
+        assert normalize_datetime(moment) == normalize_datetime('2026-10-18T07:12:08.200773+00:00')
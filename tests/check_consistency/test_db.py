@@ -1,4 +1,7 @@
+import json
+
 import pytest
+from consistency import ConsistencyChecker
 
 
 @pytest.mark.usefixtures('sqlite_cursor', 'pg_cursor')
@@ -20,26 +23,7 @@ class TestConsistency:
 
     @pytest.mark.parametrize('table', ['film_work', 'genre', 'genre_film_work', 'person', 'person_film_work'])
     def test_table_content(self, sqlite_cursor, pg_cursor, table):
-        def is_equal(dict1: dict, dict2: dict) -> (bool, str, str, str):
-            for k, v in dict1.items():
-                if k not in ('certificate', 'created_at', 'updated_at'):
-                    if v or dict2[k]:
-                        if dict2[k] != v:
-                            return False, k, v, dict2[k]
-            return True, '', '', ''
-
-        sqlite_cursor.execute('SELECT * FROM {table} ORDER BY id;'.format(table=table))
-        data_sql = sqlite_cursor.fetchall()
-
-        pg_cursor.execute('SELECT * FROM content.{table} ORDER BY id;'.format(table=table))
-        data_pg = pg_cursor.fetchall()
-
-        result = (True, '', '', '')
-        for i in range(len(data_sql)):
-            try:
-                result = is_equal(dict(data_pg[i]), dict(data_sql[i]))
-            except Exception as e:
-                result = (False, e, '', '')
-            if not result[0]:
-                break
-        assert result[0], f'key: {result[1]}; pg-value={result[2]}; sql-value={result[3]}'
+        """Rows of SQL table should be equal rows of PG table"""
+        checker = ConsistencyChecker(sqlite_cursor.connection, pg_cursor.connection)
+        diff = checker.compare_table(table)
+        assert diff.is_consistent, json.dumps(diff.as_dict(), ensure_ascii=False, indent=2)
@@ -0,0 +1,129 @@
+import uuid
+
+import psycopg2
+import pytest
+from fresh import KIND_FOREIGN_KEY, KIND_INDEX, KIND_UNIQUE, DeferredSchema
+
+TABLES = ('genre', 'film_work', 'genre_film_work')
+
+SCHEMA_DDL = """
+CREATE TABLE {schema}.genre (id uuid PRIMARY KEY, name text);
+CREATE TABLE {schema}.film_work (id uuid PRIMARY KEY, title text);
+CREATE INDEX film_work_title_idx ON {schema}.film_work (title);
+CREATE TABLE {schema}.genre_film_work (
+    id uuid PRIMARY KEY,
+    film_work_id uuid NOT NULL REFERENCES {schema}.film_work (id),
+    genre_id uuid NOT NULL REFERENCES {schema}.genre (id),
+    CONSTRAINT genre_film_work_uniq UNIQUE (film_work_id, genre_id)
+);
+"""
+
+STATE_QUERY = """
+SELECT indexname FROM pg_indexes WHERE schemaname = %(schema)s AND tablename = ANY(%(tables)s)
+UNION ALL
+SELECT conname FROM pg_constraint c JOIN pg_class t ON t.oid = c.conrelid JOIN pg_namespace n ON n.oid = t.relnamespace
+WHERE n.nspname = %(schema)s AND t.relname = ANY(%(tables)s) AND c.contype IN ('f', 'u')
+"""
+
+
+@pytest.fixture
+def pg_schema(pg_dsl):
+    """Отдельная схема с таблицами, их индексами и ключами; удаляется после теста"""
+    try:
+        connection = psycopg2.connect(**pg_dsl)
+    except psycopg2.OperationalError:
+        pytest.skip('Postgres is not available')
+    schema = 'test_fresh_{0}'.format(uuid.uuid4().hex[:8])
+    with connection.cursor() as cur:
+        cur.execute('CREATE SCHEMA {0}'.format(schema))
+        cur.execute(SCHEMA_DDL.format(schema=schema))
+    connection.commit()
+    yield connection, schema
+    connection.rollback()
+    with connection.cursor() as cur:
+        cur.execute('DROP SCHEMA {0} CASCADE'.format(schema))
+    connection.commit()
+    connection.close()
+
+
+def get_state(connection, schema) -> set:
+    with connection.cursor() as cur:
+        cur.execute(STATE_QUERY, {'schema': schema, 'tables': list(TABLES)})
+        return {row[0] for row in cur.fetchall()}
+
+
+def insert_film(connection, schema):
+    film_id, genre_id = uuid.uuid4().hex, uuid.uuid4().hex
+    with connection.cursor() as cur:
+        cur.execute('INSERT INTO {0}.film_work VALUES (%s, %s)'.format(schema), (film_id, 'Film'))
+        cur.execute('INSERT INTO {0}.genre VALUES (%s, %s)'.format(schema), (genre_id, 'Drama'))
+        cur.execute('INSERT INTO {0}.genre_film_work VALUES (%s, %s, %s)'.format(schema),
+                    (uuid.uuid4().hex, film_id, genre_id))
+    connection.commit()
+
+
+def make_deferred(connection, schema):
+    return DeferredSchema(connection, pg_scheme=schema, tables=TABLES)
+
+
+def test_drop_and_restore(pg_schema, pg_dsl):
+    connection, schema = pg_schema
+    before = get_state(connection, schema)
+    deferred = make_deferred(connection, schema)
+
+    deferred.drop()
+    assert get_state(connection, schema) == {'genre_pkey', 'film_work_pkey', 'genre_film_work_pkey'}
+    assert sorted((name, kind) for name, _, kind, _ in deferred.get_saved()) == [
+        ('film_work_title_idx', KIND_INDEX),
+        ('genre_film_work_film_work_id_fkey', KIND_FOREIGN_KEY),
+        ('genre_film_work_genre_id_fkey', KIND_FOREIGN_KEY),
+        ('genre_film_work_uniq', KIND_UNIQUE),
+    ]
+
+    insert_film(connection, schema)
+    deferred.restore(pg_dsl, workers=2)
+    assert get_state(connection, schema) == before
+    assert deferred.get_saved() == []
+
+
+def test_interrupted_load_keeps_saved_definitions(pg_schema, pg_dsl):
+    connection, schema = pg_schema
+    before = get_state(connection, schema)
+    make_deferred(connection, schema).drop()
+    saved = make_deferred(connection, schema).get_saved()
+
+    # Повторный запуск после прерванной загрузки находит таблицы уже непустыми и сохранённые определения
+    insert_film(connection, schema)
+    deferred = make_deferred(connection, schema)
+    deferred.drop()
+    assert deferred.get_saved() == saved
+    deferred.restore(pg_dsl)
+    assert get_state(connection, schema) == before
+
+
+def test_interrupted_restore_resumes(pg_schema, pg_dsl):
+    connection, schema = pg_schema
+    before = get_state(connection, schema)
+    deferred = make_deferred(connection, schema)
+    deferred.drop()
+
+    # Индекс уже построен прерванным восстановлением и снят с учёта, остальное ждёт повторного запуска
+    name, _, _, definition = next(item for item in deferred.get_saved() if item[2] == KIND_INDEX)
+    with connection.cursor() as cur:
+        cur.execute(definition)
+        cur.execute('DELETE FROM {0}.{1} WHERE name = %s'.format(schema, deferred.table), (name,))
+    connection.commit()
+
+    deferred.restore(pg_dsl)
+    assert get_state(connection, schema) == before
+    assert deferred.get_saved() == []
+
+
+def test_non_empty_tables_are_refused(pg_schema):
+    connection, schema = pg_schema
+    before = get_state(connection, schema)
+    insert_film(connection, schema)
+    with pytest.raises(RuntimeError):
+        make_deferred(connection, schema).drop()
+    connection.rollback()
+    assert get_state(connection, schema) == before
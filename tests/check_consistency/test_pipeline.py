@@ -0,0 +1,52 @@
+import sqlite3
+import threading
+
+import pytest
+from pipeline import STAGE_READ, STAGE_TRANSFORM, STAGE_WRITE, PipelinedExtractor
+
+from tests.check_consistency.conftest import GENRE_ROWIDS
+
+
+class FailingSaver:
+    @staticmethod
+    def prepare(table, data):
+        raise ValueError('cannot prepare {0}'.format(table))
+
+
+def run_with_timeout(func, timeout=5):
+    """Вызов в отдельном потоке, чтобы зависание конвейера провалило тест, а не повесило его"""
+    thread = threading.Thread(target=func, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), 'the pipeline did not stop'
+
+
+def test_batches_arrive_in_rowid_order(genre_sqlite):
+    extractor = PipelinedExtractor(genre_sqlite, batch_size=3, queue_depth=2)
+    batches = list(extractor.extract('genre', after_rowid=3))
+    expected = [rowid for rowid in GENRE_ROWIDS if rowid > 3]
+    assert [row[0] for batch in batches for row in batch.data] == expected
+    assert [batch.last_rowid for batch in batches] == [9, 15, 21, 30]
+    counters = extractor.counters['genre']
+    assert counters[STAGE_READ].batches == counters[STAGE_TRANSFORM].batches == counters[STAGE_WRITE].batches == 4
+
+
+def test_reader_error_is_raised_in_writer(tmp_path):
+    path = str(tmp_path / 'broken.sqlite')
+    sqlite3.connect(path).execute('CREATE TABLE genre (id TEXT)').connection.close()
+    with pytest.raises(sqlite3.OperationalError):
+        list(PipelinedExtractor(path).extract('genre'))
+
+
+def test_transform_error_is_raised_in_writer(genre_sqlite):
+    with pytest.raises(ValueError, match='cannot prepare genre'):
+        list(PipelinedExtractor(genre_sqlite, batch_size=2, saver_class=FailingSaver).extract('genre'))
+
+
+def test_closing_the_writer_stops_both_stages(genre_sqlite):
+    before = set(threading.enumerate())
+    batches = PipelinedExtractor(genre_sqlite, batch_size=1, queue_depth=1).extract('genre')
+    assert next(batches).last_rowid == GENRE_ROWIDS[0]
+    assert len(set(threading.enumerate()) - before) == 2
+    run_with_timeout(batches.close)
+    assert set(threading.enumerate()) == before
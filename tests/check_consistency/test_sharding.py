@@ -0,0 +1,83 @@
+import sqlite3
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+
+import pytest
+from adapters import get_row_adapter
+from loaders import PostgresCopySaver
+from sharding import ShardedExtractor, get_rowid_ranges
+
+from tests.check_consistency.conftest import GENRE_ROWIDS
+
+
+class ImmediateExecutor(Executor):
+    """Выполняет задание сразу при отправке и считает отправленные"""
+
+    def __init__(self):
+        self.submitted = 0
+
+    def submit(self, fn, *args, **kwargs):
+        self.submitted += 1
+        future = Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+
+def get_ranges(path, width, after_rowid=None):
+    connection = sqlite3.connect(path)
+    try:
+        return list(get_rowid_ranges(connection, 'genre', width, after_rowid))
+    finally:
+        connection.close()
+
+
+class TestRowidRanges:
+    @pytest.mark.parametrize('after_rowid', [None, 0, 4, 9, 29])
+    @pytest.mark.parametrize('width', [1, 3, 7, 100])
+    def test_ranges_cover_rows_without_gaps(self, genre_sqlite, width, after_rowid):
+        ranges = get_ranges(genre_sqlite, width, after_rowid)
+        assert ranges[0][0] == (GENRE_ROWIDS[0] - 1 if after_rowid is None else after_rowid)
+        assert ranges[-1][1] == GENRE_ROWIDS[-1]
+        assert all(previous[1] == following[0] for previous, following in zip(ranges, ranges[1:]))
+        assert all(0 < hi - lo <= width for lo, hi in ranges)
+        for rowid in GENRE_ROWIDS:
+            covering = [(lo, hi) for lo, hi in ranges if lo < rowid <= hi]
+            assert len(covering) == (0 if after_rowid is not None and rowid <= after_rowid else 1)
+
+    def test_nothing_after_last_row(self, genre_sqlite):
+        assert get_ranges(genre_sqlite, 5, GENRE_ROWIDS[-1]) == []
+
+    def test_empty_table(self, tmp_path):
+        path = str(tmp_path / 'empty.sqlite')
+        sqlite3.connect(path).execute('CREATE TABLE genre (id TEXT)').connection.close()
+        assert get_ranges(path, 5) == []
+
+
+class TestShardedExtractor:
+    @pytest.mark.parametrize('after_rowid', [None, 9])
+    def test_batches_arrive_in_rowid_order(self, genre_sqlite, after_rowid):
+        with ProcessPoolExecutor(max_workers=3) as executor:
+            batches = list(ShardedExtractor(genre_sqlite, executor, batch_size=4).extract('genre', after_rowid))
+        rowids = [row[0] for batch in batches for row in batch.data]
+        assert rowids == [rowid for rowid in GENRE_ROWIDS if after_rowid is None or rowid > after_rowid]
+        assert [batch.last_rowid for batch in batches] == [hi for _, hi in get_ranges(genre_sqlite, 4, after_rowid)]
+        assert sum(batch.rows for batch in batches) == len(rowids)
+
+    @pytest.mark.parametrize('queue_depth', [1, 2, 5])
+    def test_queue_depth_bounds_ranges_in_flight(self, genre_sqlite, queue_depth):
+        executor = ImmediateExecutor()
+        received = 0
+        for _ in ShardedExtractor(genre_sqlite, executor, batch_size=2, queue_depth=queue_depth).extract('genre'):
+            received += 1
+            assert executor.submitted - received < queue_depth
+        assert received == executor.submitted == len(get_ranges(genre_sqlite, 2))
+
+    def test_ranges_are_prepared_in_workers(self, genre_sqlite):
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            extractor = ShardedExtractor(genre_sqlite, executor, batch_size=10, saver_class=PostgresCopySaver)
+            batches = list(extractor.extract('genre'))
+        adapter = get_row_adapter('genre')
+        connection = sqlite3.connect(genre_sqlite)
+        rows = connection.execute(adapter.get_select_query() + ' ORDER BY rowid').fetchall()
+        connection.close()
+        assert all(batch.prepared for batch in batches if batch.rows)
+        assert ''.join(batch.data for batch in batches if batch.rows) == ''.join(map(adapter.copy_line, rows))